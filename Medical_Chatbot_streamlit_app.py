@@ -14,13 +14,12 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-# Import RAG components
+# Import RAG components (the QA engine and its LangChain/FAISS stack load lazily in get_rag_chain_engine_v2)
 try:
-    from app.components.retriever import create_qa_chain
+    from app.common.startup import startup
     from app.config.config import HUGGINGFACE_REPO_ID
 except ImportError as e:
     st.error(f"Error importing app components: {e}")
-    create_qa_chain = None
 
 # ... [KEEP styling config as is] ...
 st.set_page_config(
@@ -176,15 +175,16 @@ tab1, tab2, tab3, tab4, tab5 = st.tabs([
 # Loading the QA chain (Cached) - Renamed to force cache invalidation
 @st.cache_resource(show_spinner="Initializing Medical Intelligence Engine...")
 def get_rag_chain_engine_v2():
-    # Helper to load the chain.
-    if create_qa_chain:
-        try:
-            return create_qa_chain()
-        except Exception as e:
-            # We cannot log to ST here, just return None or log using standard logger
-            print(f"Error initializing RAG Chain: {e}") 
-            return None
-    return None
+    # Helper to load the process-wide QA engine (chain + answer cache).
+    try:
+        get_qa_engine = startup.import_module("app.components.qa_engine").get_qa_engine
+        engine = get_qa_engine()
+        engine.chain  # build eagerly so failures surface here
+        return engine
+    except Exception as e:
+        # We cannot log to ST here, just return None or log using standard logger
+        print(f"Error initializing RAG Chain: {e}") 
+        return None
 
 chain = get_rag_chain_engine_v2()
 
@@ -456,10 +456,14 @@ with tab1:
                 st.write("📚 Retrieving relevant medical context...")
                 
                 try:
-                    res = chain.invoke({"query": prompt})
-                    answer = res["result"]
-                    
                     st.write("✅ Generating evidence-based medical response...")
+
+                    # Render tokens as the LLM produces them
+                    answer_stream = chain.stream(prompt)
+                    st.write_stream(answer_stream)
+                    answer = answer_stream.answer
+                    if answer_stream.ttft is not None:
+                        st.caption(f"⚡ First token in {answer_stream.ttft * 1000:.0f} ms")
                     
                     # Add bot message
                     st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -1183,39 +1187,66 @@ with tab5:
         # Check HF Token
         hf_status = "Configured" if os.environ.get("HF_TOKEN") or (st.secrets.get("HF_TOKEN") if hasattr(st, "secrets") else False) else "Missing"
         st.metric("LLM Engine", hf_status, delta="Auth OK 🟢" if hf_status == "Configured" else "Auth Fail 🔴")
+    # Real per-stage latencies from this process's QA engine
+    stage_stats = chain.stats()["stages"] if chain else {}
+    total_stats = stage_stats.get("total", {})
     with col_health4:
-         st.metric("Latency", "24ms", delta="-5ms") # Placeholder for real latency
+        if total_stats.get("p50_ms") is not None:
+            st.metric("Latency (p50)", f"{total_stats['p50_ms']:.0f}ms", delta=f"p99 {total_stats['p99_ms']:.0f}ms", delta_color="off")
+        else:
+            st.metric("Latency (p50)", "—", delta="No requests yet", delta_color="off")
+
+    if stage_stats:
+        with st.expander("⏱️ Per-stage latency (rolling window)", expanded=False):
+            stage_order = ["query_embedding", "faiss_search", "prompt_assembly", "llm_ttft", "llm_generation", "total"]
+            st.dataframe(
+                [{"stage": name, **stage_stats[name]} for name in stage_order if name in stage_stats],
+                use_container_width=True,
+                hide_index=True,
+            )
 
     st.markdown("---")
     
-    # Log Viewer
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        st.warning("No log directory found.")
+    # Log Viewer: pages through the log from the end using the reader's offset index
+    from app.common.log_reader import list_log_files, get_log_reader
+    from app.common.logger import LOGS_DIR
+
+    log_files = list_log_files(LOGS_DIR)
+    if not log_files:
+        st.warning("No log files found.")
     else:
-        log_files = sorted([f for f in os.listdir(log_dir) if f.endswith(".log")], reverse=True)
         selected_log = st.selectbox("Select Log File", log_files)
-        
+
         if selected_log:
-            with open(os.path.join(log_dir, selected_log), "r") as f:
-                logs = f.readlines()
-                
-            # Search Filter
-            search_term = st.text_input("🔍 Search Logs", placeholder="Type error, warning, or keyword...")
-            
-            # Simple Log Parsing for Display
-            log_container = st.container(height=400)
-            with log_container:
-                for line in logs:
-                    if search_term.lower() in line.lower():
-                        if "ERROR" in line:
-                            st.error(line.strip(), icon="❌")
-                        elif "WARNING" in line:
-                            st.warning(line.strip(), icon="⚠️")
-                        else:
-                            st.code(line.strip(), language="log")
-
-            st.download_button("⬇️ Download Log", data="".join(logs), file_name=selected_log)
+            log_path = os.path.join(LOGS_DIR, selected_log)
+            reader = get_log_reader(log_path)
+            counts = reader.level_counts()
+
+            col_search, col_level, col_page = st.columns([3, 2, 1])
+            with col_search:
+                search_term = st.text_input("🔍 Search Logs", placeholder="Type error, warning, or keyword...")
+            with col_level:
+                selected_levels = st.multiselect("Level", sorted(counts), format_func=lambda level: f"{level} ({counts[level]})")
+            with col_page:
+                page = st.number_input("Page", min_value=1, value=1, step=1)
+
+            page_size = 200
+            records, has_older = reader.tail(limit=page_size, page=page - 1, levels=selected_levels, search=search_term)
+            st.caption(
+                f"{sum(counts.values())} records in file · showing {len(records)} newest-first on page {page}"
+                + (" · older matches on the next page" if has_older else "")
+            )
+
+            # One table widget per page rather than one widget per line
+            st.dataframe(
+                [{"level": record.level, "record": record.text} for record in records],
+                use_container_width=True,
+                hide_index=True,
+                height=400,
+            )
+
+            with open(log_path, "rb") as f:
+                st.download_button("⬇️ Download Log", data=f, file_name=selected_log)
 
 # --- Footer ---
 st.markdown("""
@@ -1,13 +1,31 @@
-from flask import Flask,render_template,request,session,redirect,url_for
-from app.components.retriever import create_qa_chain
+from app.common.startup import startup
+from flask import Flask,render_template,request,session,redirect,url_for,jsonify,abort,Response,g
+from app.common.logger import get_logger,log_stats,set_request_id,reset_request_id,get_request_id
+from app.common.custom_exception import CustomException
+from app.components.conversation_store import get_conversation_store
+from app.config.config import QA_ENGINE_WARMUP,RELOAD_TOKEN,BATCH_MAX_QUESTIONS,CONVERSATION_PAGE_SIZE,CONVERSATION_STORE,FLASK_SECRET_KEY
 from dotenv import load_dotenv
 import os
+import json
+import threading
+import uuid
 
 load_dotenv()
 HF_TOKEN = os.environ.get("HF_TOKEN")
 
+logger = get_logger(__name__)
+
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+
+if FLASK_SECRET_KEY:
+    app.secret_key = FLASK_SECRET_KEY
+elif CONVERSATION_STORE == "sqlite":
+    # A shared store means several workers; each would sign cookies with its own random key
+    raise CustomException("FLASK_SECRET_KEY must be set when CONVERSATION_STORE=sqlite")
+else:
+    logger.warning("FLASK_SECRET_KEY is not set; using a random per-process key. Sessions will not survive "
+                   "a restart or work across several workers. Set FLASK_SECRET_KEY in production.")
+    app.secret_key = os.urandom(24)
 
 from markupsafe import Markup
 def nl2br(value):
@@ -15,39 +33,156 @@ def nl2br(value):
 
 app.jinja_env.filters['nl2br'] = nl2br
 
+def get_engine():
+    # LangChain, FAISS and the model stack load on first use, so the app can serve /healthz right away
+    return startup.import_module("app.components.qa_engine").get_qa_engine()
+
+def warm_up():
+    startup.preload()
+    get_engine().warm_up()
+
+if QA_ENGINE_WARMUP:
+    threading.Thread(target=warm_up , name="qa-engine-warmup" , daemon=True).start()
+
+conversations = get_conversation_store()
+
+def conversation_id():
+    # The cookie only carries this ID; the messages live in the conversation store
+    if "conversation_id" not in session:
+        session["conversation_id"] = uuid.uuid4().hex
+    return session["conversation_id"]
+
+def render_conversation(page=1 , error=None):
+    cid = conversation_id()
+    total = conversations.count(cid)
+    messages = conversations.recent(cid , CONVERSATION_PAGE_SIZE , offset=(page - 1) * CONVERSATION_PAGE_SIZE)
+    return render_template("index.html" , messages=messages , error=error , page=page , has_older=total > page * CONVERSATION_PAGE_SIZE)
+
+@app.before_request
+def tag_request():
+    g.request_id_token = set_request_id(request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16])
+
+@app.after_request
+def add_request_id(response):
+    response.headers["X-Request-ID"] = get_request_id()
+    return response
+
+@app.teardown_request
+def untag_request(error=None):
+    token = g.pop("request_id_token" , None)
+    if token is not None:
+        reset_request_id(token)
+
+def sse_event(event , data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route("/" , methods=["GET","POST"])
 def index():
-    if "messages" not in session:
-        session["messages"]=[]
+    cid = conversation_id()
 
     if request.method=="POST":
         user_input = request.form.get("prompt")
 
         if user_input:
-            messages = session["messages"]
-            messages.append({"role" : "user" , "content":user_input})
-            session["messages"] = messages
+            conversations.append(cid , {"role" : "user" , "content":user_input})
 
             try:
-                qa_chain = create_qa_chain()
-                response = qa_chain.invoke({"query" : user_input})
+                response = get_engine().invoke(user_input)
                 result = response.get("result" , "No response")
 
-                messages.append({"role" : "assistant" , "content" : result})
-                session["messages"] = messages
+                conversations.append(cid , {"role" : "assistant" , "content" : result})
 
             except Exception as e:
                 error_msg = f"Error : {str(e)}"
-                return render_template("index.html" , messages = session["messages"] , error = error_msg)
+                return render_conversation(error = error_msg)
             
         return redirect(url_for("index"))
-    return render_template("index.html" , messages=session.get("messages" , []))
+    return render_conversation(page = max(request.args.get("page" , 1 , type=int) , 1))
+
+@app.route("/stream" , methods=["POST"])
+def stream():
+    user_input = request.form.get("prompt")
+    if not user_input:
+        return jsonify({"error" : "prompt is required"}) , 400
+
+    answer_stream = get_engine().stream(user_input)
+    # Captured now: the generator runs after the request context is gone
+    cid = conversation_id()
+    request_id = get_request_id()
+
+    def answer_events():
+        try:
+            for token in answer_stream:
+                yield sse_event("token" , {"token" : token})
+        except Exception as e:
+            yield sse_event("error" , {"error" : f"Error : {str(e)}"})
+            return
+
+        conversations.append(cid , {"role" : "user" , "content" : user_input} , {"role" : "assistant" , "content" : answer_stream.answer})
+
+        yield sse_event("done" , {
+            "ttft_ms" : round(answer_stream.ttft * 1000) if answer_stream.ttft is not None else None,
+            "total_ms" : round(answer_stream.total_time * 1000) if answer_stream.total_time is not None else None,
+            "cached" : answer_stream.cached,
+        })
+
+    def events():
+        request_id_token = set_request_id(request_id)
+        try:
+            yield from answer_events()
+        finally:
+            reset_request_id(request_id_token)
+
+    return Response(events() , mimetype="text/event-stream" , headers={"Cache-Control" : "no-cache" , "X-Accel-Buffering" : "no"})
+
+@app.route("/batch" , methods=["POST"])
+def batch():
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions") if isinstance(data , dict) else None
+    if not isinstance(questions , list) or not questions:
+        return jsonify({"error" : "questions must be a non-empty list"}) , 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error" : f"At most {BATCH_MAX_QUESTIONS} questions per batch"}) , 413
+
+    try:
+        responses = get_engine().invoke_batch(questions)
+    except Exception as e:
+        return jsonify({"error" : f"Error : {str(e)}"}) , 500
+
+    results = []
+    for response in responses:
+        if "error" in response:
+            results.append({"question" : response["query"] , "error" : response["error"]})
+        else:
+            results.append({"question" : response["query"] , "answer" : response.get("result") or "No response"})
+    return jsonify({"results" : results})
 
 @app.route("/clear")
 def clear():
-    session.pop("messages" , None)
+    conversations.clear(conversation_id())
     return redirect(url_for("index"))
 
+@app.route("/healthz")
+def healthz():
+    report = startup.report()
+    return jsonify({"status" : "ok" , "ready" : "engine_ready" in report["phases"] , "startup" : report})
+
+@app.route("/metrics")
+def metrics():
+    return jsonify({**get_engine().stats() , "conversations" : conversations.stats() , "logging" : log_stats()})
+
+@app.route("/reload" , methods=["POST"])
+def reload_engine():
+    if not RELOAD_TOKEN or request.headers.get("X-Reload-Token") != RELOAD_TOKEN:
+        abort(403)
+    try:
+        get_engine().reload()
+    except Exception as e:
+        return jsonify({"status" : "error" , "error" : str(e)}) , 500
+    return jsonify({"status" : "reloaded"})
+
+startup.mark("app_imported")
+
 if __name__=="__main__":
     app.run(host="0.0.0.0" , port=5000 , debug=False , use_reloader = False)
 
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+
+from app.common.startup import startup
+from app.common.logger import get_logger, log_stats, set_request_id, get_request_id
+from app.common.custom_exception import CustomException
+
+from app.config.config import QA_ENGINE_WARMUP, ASGI_MAX_CONCURRENCY, ASGI_MAX_QUEUE, BATCH_MAX_QUESTIONS
+
+logger = get_logger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight questions per process and tracks how many are queued for a slot"""
+
+    def __init__(self, max_concurrency=ASGI_MAX_CONCURRENCY, max_queue=ASGI_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def slot(self):
+        # Created lazily so it binds to the server's running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self.max_queue and self._semaphore.locked() and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"{self.queue_depth} requests already waiting")
+
+        self.queue_depth += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+limiter = ConcurrencyLimiter()
+
+
+def get_engine():
+    # LangChain, FAISS and the model stack load on first use, so the server can answer /healthz right away
+    return startup.import_module("app.components.qa_engine").get_qa_engine()
+
+
+def warm_up():
+    startup.preload()
+    get_engine().warm_up()
+
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if get_request_id():
+        headers.append((b"x-request-id", get_request_id().encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def ask(receive, send):
+    try:
+        data = await read_json(receive)
+    except ValueError:
+        return await send_json(send, 400, {"error": "Request body must be JSON"})
+
+    question = data.get("question") if isinstance(data, dict) else None
+    if not question:
+        return await send_json(send, 400, {"error": "Question is required"})
+
+    try:
+        async with limiter.slot():
+            # The first call may still be importing the engine; keep that off the event loop
+            engine = await asyncio.to_thread(get_engine)
+            response = await engine.ainvoke(question)
+    except QueueFullError as e:
+        return await send_json(send, 503, {"error": f"Server busy: {e}"})
+    except Exception as e:
+        error_message = CustomException("Failed to answer question", e)
+        logger.error(str(error_message))
+        return await send_json(send, 500, {"error": f"Error : {str(e)}"})
+
+    await send_json(send, 200, {"answer": response.get("result", "No response")})
+
+
+async def ask_batch(receive, send):
+    try:
+        data = await read_json(receive)
+    except ValueError:
+        return await send_json(send, 400, {"error": "Request body must be JSON"})
+
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions:
+        return await send_json(send, 400, {"error": "questions must be a non-empty list"})
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return await send_json(send, 413, {"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"})
+
+    try:
+        # A batch takes one slot; its own LLM fan-out is bounded by BATCH_MAX_CONCURRENCY
+        async with limiter.slot():
+            responses = await asyncio.to_thread(lambda: get_engine().invoke_batch(questions))
+    except QueueFullError as e:
+        return await send_json(send, 503, {"error": f"Server busy: {e}"})
+    except Exception as e:
+        error_message = CustomException("Failed to answer batch", e)
+        logger.error(str(error_message))
+        return await send_json(send, 500, {"error": f"Error : {str(e)}"})
+
+    results = [
+        {"question": r["query"], "error": r["error"]} if "error" in r else {"question": r["query"], "answer": r.get("result") or "No response"}
+        for r in responses
+    ]
+    await send_json(send, 200, {"results": results})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if QA_ENGINE_WARMUP:
+                asyncio.get_running_loop().run_in_executor(None, warm_up)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: POST /ask answers a question, POST /ask/batch answers a list of them,
+    GET /metrics reports concurrency and stage latencies, GET /healthz answers without loading the engine"""
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] != "http":
+        return
+
+    # Each request runs in its own task, so the id only tags this request's log records
+    set_request_id(dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex[:16])
+
+    route = (scope["method"], scope["path"])
+    if route == ("POST", "/ask"):
+        return await ask(receive, send)
+    if route == ("POST", "/ask/batch"):
+        return await ask_batch(receive, send)
+    if route == ("GET", "/metrics"):
+        engine = await asyncio.to_thread(get_engine)
+        return await send_json(send, 200, {**limiter.stats(), **engine.stats(), "logging": log_stats()})
+    if route == ("GET", "/healthz"):
+        report = startup.report()
+        return await send_json(send, 200, {"status": "ok", "ready": "engine_ready" in report["phases"], "startup": report})
+
+    await send_json(send, 404, {"error": "Not found"})
+
+
+startup.mark("app_imported")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app.asgi:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,105 @@
+"""Recall-vs-latency benchmark of ANN index types against the exact flat index.
+
+Usage:
+    python -m app.benchmarks.ann --k 5 --queries 500 --types flat ivf hnsw pq ivfpq
+
+Vectors come from the saved flat vector store at DB_FAISS_PATH. Queries are corpus
+vectors with a little noise added (or real questions with --questions-file).
+Ground truth is the exact flat search.
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from app.components.ann_index import INDEX_TYPES, create_faiss_index, index_type_of
+
+from app.config.config import DB_FAISS_PATH
+
+
+def load_corpus_vectors(path=DB_FAISS_PATH):
+    index = faiss.read_index(os.path.join(path, "index.faiss"))
+    if index_type_of(index) != "flat":
+        raise SystemExit("Benchmark needs a flat vector store as ground truth; rebuild with VECTOR_INDEX_TYPE=flat")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def make_queries(vectors, n_queries, questions_file=None, seed=0):
+    if questions_file:
+        from app.components.embeddings import get_embedding_model
+        with open(questions_file, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        return np.array(get_embedding_model().embed_documents(questions), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.01, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    return queries.astype(np.float32)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def benchmark_index(index_type, vectors, queries, ground_truth, k):
+    start = time.perf_counter()
+    index = create_faiss_index(vectors.shape[1], n_vectors=len(vectors), index_type=index_type)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        t0 = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - t0)
+        found[i] = ids[0]
+
+    recall = np.mean([len(set(found[i]) & set(ground_truth[i])) / k for i in range(len(queries))])
+
+    return {
+        "index_type": index_type,
+        "effective_type": index_type_of(index),
+        "build_seconds": round(build_seconds, 3),
+        f"recall@{k}": round(float(recall), 4),
+        "p50_ms": round(percentile_ms(latencies, 50), 4),
+        "p99_ms": round(percentile_ms(latencies, 99), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--questions-file", help="Text file with one question per line to use as queries")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    vectors = np.ascontiguousarray(load_corpus_vectors(), dtype=np.float32)
+    queries = make_queries(vectors, args.queries, args.questions_file)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ground_truth = exact.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+    results = [benchmark_index(index_type, vectors, queries, ground_truth, args.k) for index_type in args.types]
+
+    header = ["index_type", "effective_type", "build_seconds", f"recall@{args.k}", "p50_ms", "p99_ms"]
+    print("  ".join(f"{name:>14}" for name in header))
+    for result in results:
+        print("  ".join(f"{str(result[name]):>14}" for name in header))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Throughput and agreement of embedding backends against the PyTorch reference.
+
+Usage:
+    python -m app.benchmarks.embeddings --texts 1000 --queries 200
+    python -m app.benchmarks.embeddings --backends huggingface onnx-int8 --output embeddings.json
+
+Texts are chunks of the corpus in DATA_PATH (or lines of --texts-file). For each
+backend it reports load time, batch throughput, single-query p50/p99 latency and,
+against the huggingface backend, the cosine similarity of each vector pair and
+how much of the top-k nearest-neighbour set is preserved.
+"""
+import argparse
+import json
+import time
+from itertools import islice
+
+import numpy as np
+
+BACKENDS = ("huggingface", "onnx-fp32", "onnx-int8")
+REFERENCE = "huggingface"
+
+
+def load_backend(name):
+    if name == "huggingface":
+        from app.components.embeddings import load_embedding_backend
+        return load_embedding_backend("huggingface")
+
+    from app.components.onnx_embeddings import OnnxEmbeddings
+    return OnnxEmbeddings(quantized=name == "onnx-int8")
+
+
+def load_texts(n_texts, texts_file=None):
+    if texts_file:
+        with open(texts_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in islice((l for l in f if l.strip()), n_texts)]
+
+    from app.components.pdf_loader import list_data_files, iter_documents, iter_text_chunks
+    chunks = iter_text_chunks(iter_documents(list_data_files()))
+    return [chunk.page_content for chunk in islice(chunks, n_texts)]
+
+
+def benchmark_backend(name, texts, queries):
+    start = time.perf_counter()
+    model = load_backend(name)
+    load_seconds = time.perf_counter() - start
+
+    model.embed_documents(texts[:8])  # warm-up
+
+    start = time.perf_counter()
+    vectors = np.array(model.embed_documents(texts), dtype=np.float32)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        model.embed_query(query)
+        latencies.append(time.perf_counter() - t0)
+
+    return vectors, {
+        "backend": name,
+        "load_seconds": round(load_seconds, 3),
+        "texts_per_second": round(len(texts) / batch_seconds, 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50) * 1000), 3),
+        "query_p99_ms": round(float(np.percentile(latencies, 99) * 1000), 3),
+    }
+
+
+def agreement(vectors, reference, k):
+    """Pairwise cosine to the reference vectors plus overlap of each text's top-k neighbours"""
+    def normalized(v):
+        return v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-12, None)
+
+    vectors, reference = normalized(vectors), normalized(reference)
+    cosine = np.sum(vectors * reference, axis=1)
+
+    k = min(k, len(vectors) - 1)
+    if k < 1:
+        return {"cosine_mean": round(float(cosine.mean()), 5), "cosine_min": round(float(cosine.min()), 5)}
+
+    def neighbours(v):
+        similarities = v @ v.T
+        np.fill_diagonal(similarities, -np.inf)
+        return np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+    ours, theirs = neighbours(vectors), neighbours(reference)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ours, theirs)])
+
+    return {
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_p01": round(float(np.percentile(cosine, 1)), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        f"neighbour_overlap@{k}": round(float(overlap), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts", type=int, default=1000, help="Corpus chunks to embed")
+    parser.add_argument("--queries", type=int, default=200, help="Single-text embed_query calls to time")
+    parser.add_argument("--texts-file", help="Text file with one passage per line instead of the corpus")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.texts_file)
+    if not texts:
+        raise SystemExit("No texts to embed")
+    queries = [texts[i % len(texts)][:200] for i in range(args.queries)]
+    print(f"{len(texts)} texts, {len(queries)} queries")
+
+    results, vectors = [], {}
+    for name in args.backends:
+        vectors[name], result = benchmark_backend(name, texts, queries)
+        results.append(result)
+
+    if REFERENCE in vectors:
+        for result in results:
+            if result["backend"] != REFERENCE:
+                result.update(agreement(vectors[result["backend"]], vectors[REFERENCE], args.k))
+
+    header = list(dict.fromkeys(key for result in results for key in result))
+    print("  ".join(f"{name:>16}" for name in header))
+    for result in results:
+        print("  ".join(f"{str(result.get(name, '')):>16}" for name in header))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"texts": len(texts), "queries": len(queries), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""End-to-end retrieval + generation benchmark with a stub LLM.
+
+Usage:
+    python -m app.benchmarks.rag --concurrency 1 4 16 --requests 200 --output bench.json
+    python -m app.benchmarks.rag --llm inprocess --baseline bench.json
+
+Builds a fresh vector store from DATA_PATH into a scratch directory (timed), then
+drives create_qa_chain() with questions at each concurrency level. The LLM is the
+stub from app.benchmarks.stub_llm: served over HTTP to the real ChatOpenAI client
+(--llm server, the default), called in-process (--llm inprocess), or an already
+running OpenAI-compatible endpoint (--llm-url). Results include QPS, latency
+percentiles, per-stage timings and peak RSS; --baseline prints the change against
+an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+DEFAULT_QUESTIONS = [
+    "What are the common symptoms of fever?",
+    "How is pneumonia treated?",
+    "What causes high blood pressure?",
+    "What are the warning signs of a heart attack?",
+    "How is diabetes diagnosed?",
+    "What is the treatment for a migraine?",
+    "What are the side effects of antibiotics?",
+    "How can asthma attacks be prevented?",
+    "What causes anemia?",
+    "When should a cough be checked by a doctor?",
+]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_questions(questions_file=None):
+    if not questions_file:
+        return DEFAULT_QUESTIONS
+    with open(questions_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    samples = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(samples.mean()), 2),
+        "max_ms": round(float(samples.max()), 2),
+    }
+
+
+def build_index():
+    from app.components.pdf_loader import list_data_files
+    from app.components.vector_store import update_vector_store
+
+    start = time.perf_counter()
+    db = update_vector_store(full_rebuild=True)
+    seconds = time.perf_counter() - start
+    if db is None:
+        raise SystemExit("Index build failed; see logs")
+
+    return db, {
+        "files": len(list_data_files()),
+        "vectors": int(db.index.ntotal),
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def make_llm(args):
+    from app.benchmarks.stub_llm import StubChatModel, start_stub_server
+    from app.components.llm import load_llm
+
+    stub = {"ttft": args.stub_ttft_ms / 1000, "token_delay": args.stub_token_ms / 1000, "n_tokens": args.stub_tokens}
+    if args.llm_url:
+        return load_llm(hf_token="stub", api_base=args.llm_url), None
+    if args.llm == "inprocess":
+        return StubChatModel(**stub), None
+
+    server = start_stub_server(**stub)
+    return load_llm(hf_token="stub", api_base=server.api_base), server
+
+
+def run_level(chain, questions, concurrency, n_requests):
+    from app.components.retriever import StageTimingHandler
+    from app.common.metrics import metrics
+
+    metrics.reset()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def ask(i):
+        question = questions[i % len(questions)]
+        start = time.perf_counter()
+        try:
+            chain.invoke({"query": question}, config={"callbacks": [StageTimingHandler()]})
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(ask, range(n_requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 3),
+        "qps": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "latency": latency_summary(latencies),
+        "stages": metrics.snapshot(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline_file):
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def change(new, old):
+        if new is None or not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nAgainst {baseline_file} ({(baseline.get('commit') or 'unknown')[:12]}):")
+    print(f"  index build: {results['build']['seconds']}s vs {baseline['build']['seconds']}s ({change(results['build']['seconds'], baseline['build']['seconds'])})")
+    old_runs = {run["concurrency"]: run for run in baseline.get("runs", [])}
+    for run in results["runs"]:
+        old = old_runs.get(run["concurrency"])
+        if old is None:
+            continue
+        print(
+            f"  c={run['concurrency']:<4} qps {change(run['qps'], old['qps']):>8}   "
+            f"p50 {change(run['latency']['p50_ms'], old['latency']['p50_ms']):>8}   "
+            f"p99 {change(run['latency']['p99_ms'], old['latency']['p99_ms']):>8}"
+        )
+
+
+def run(args):
+    from app.components.retriever import create_qa_chain
+    from app.components.vector_store import load_vector_store
+
+    db, build = build_index()
+    print(f"Indexed {build['vectors']} vectors from {build['files']} files in {build['seconds']}s")
+
+    # Time a cold load of what was just saved, the way a server process starts
+    del db
+    start = time.perf_counter()
+    db = load_vector_store()
+    load_seconds = time.perf_counter() - start
+
+    llm, server = make_llm(args)
+    chain = create_qa_chain(db, llm=llm)
+    if chain is None:
+        raise SystemExit("QA chain could not be created; see logs")
+
+    questions = load_questions(args.questions_file)
+    for i in range(args.warmup):
+        chain.invoke({"query": questions[i % len(questions)]})
+
+    from app.components.http_client import http_stats
+
+    runs = []
+    for concurrency in args.concurrency:
+        before = http_stats()
+        result = run_level(chain, questions, concurrency, args.requests)
+        after = http_stats()
+        # LLM HTTP requests vs TCP connections opened during this level (zero for the in-process stub)
+        result["llm_http"] = {name: after[name] - before[name] for name in ("requests", "new_connections", "retries")}
+        runs.append(result)
+        latency = result["latency"]
+        print(
+            f"c={concurrency:<4} qps={result['qps']}  p50={latency['p50_ms']}ms  p95={latency['p95_ms']}ms  "
+            f"p99={latency['p99_ms']}ms  errors={result['errors']}  "
+            f"llm connections={result['llm_http']['new_connections']}/{result['llm_http']['requests']} requests"
+        )
+
+    if server is not None:
+        server.shutdown()
+
+    from app.config.config import VECTOR_INDEX_TYPE, RETRIEVER_K, EMBED_WORKERS, EMBED_BATCH_SIZE
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "data_path": args.data_path,
+            "llm": "url" if args.llm_url else args.llm,
+            "stub_ttft_ms": args.stub_ttft_ms,
+            "stub_token_ms": args.stub_token_ms,
+            "stub_tokens": args.stub_tokens,
+            "questions": len(questions),
+            "vector_index_type": VECTOR_INDEX_TYPE,
+            "retriever_k": RETRIEVER_K,
+            "embed_workers": EMBED_WORKERS,
+            "embed_batch_size": EMBED_BATCH_SIZE,
+        },
+        "build": build,
+        "load_seconds": round(load_seconds, 3),
+        "runs": runs,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default=os.environ.get("DATA_PATH", "data/"), help="Corpus directory to index")
+    parser.add_argument("--workdir", help="Where to build the index (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Questions asked at each concurrency level")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--questions-file", help="Text file with one question per line")
+    parser.add_argument("--llm", choices=["server", "inprocess"], default="server")
+    parser.add_argument("--llm-url", help="Use a running OpenAI-compatible endpoint instead of the built-in stub")
+    parser.add_argument("--stub-ttft-ms", type=float, default=50.0)
+    parser.add_argument("--stub-token-ms", type=float, default=5.0)
+    parser.add_argument("--stub-tokens", type=int, default=64)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    # Paths are read from the environment when app.config is first imported
+    os.environ["DATA_PATH"] = args.data_path
+    os.environ["DB_FAISS_PATH"] = os.path.join(workdir, "db_faiss")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache")
+
+    try:
+        results = run(args)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
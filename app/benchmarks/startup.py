@@ -0,0 +1,97 @@
+"""Cold-start import report for the server entry points.
+
+Usage:
+    python -m app.benchmarks.startup --top 20 --output startup.json
+    python -m app.benchmarks.startup --baseline startup.json
+
+Imports each entry module in a fresh interpreter with `python -X importtime` and
+reports the wall time plus the slowest modules by cumulative and self time.
+Entry points should stay light: the QA engine's dependencies load on first use.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+ENTRY_MODULES = ("app.application", "app.asgi")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_import(module, runs=3):
+    """Best-of-`runs` wall time for importing `module`, plus the per-module timings of that run"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True,
+            # Only the import is measured, not the background warm-up it would start
+            env={**os.environ, "QA_ENGINE_WARMUP": "false"},
+        )
+        wall = time.perf_counter() - start
+        if completed.returncode != 0:
+            raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+        if best is None or wall < best[0]:
+            best = (wall, completed.stderr)
+
+    wall, stderr = best
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+
+    loaded = {m["module"] for m in modules}
+    return {
+        "module": module,
+        "wall_ms": round(wall * 1000, 1),
+        "modules_imported": len(modules),
+        "heavy_loaded": sorted(name for name in ("torch", "transformers", "langchain", "langchain_openai", "faiss", "streamlit") if name in loaded),
+        "by_cumulative": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True),
+        "by_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_MODULES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare wall times against")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = profile_import(module, args.runs)
+        result["by_cumulative"] = result["by_cumulative"][:args.top]
+        result["by_self"] = result["by_self"][:args.top]
+        results.append(result)
+
+        print(f"\n{module}: {result['wall_ms']} ms wall, {result['modules_imported']} modules, heavy: {result['heavy_loaded'] or 'none'}")
+        print(f"  {'cumulative ms':>14}  {'self ms':>9}  module")
+        for entry in result["by_cumulative"]:
+            print(f"  {entry['cumulative_ms']:>14.1f}  {entry['self_ms']:>9.1f}  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = {r["module"]: r for r in json.load(f)["results"]}
+        print()
+        for result in results:
+            old = baseline.get(result["module"])
+            if old:
+                change = (result["wall_ms"] - old["wall_ms"]) / old["wall_ms"] * 100
+                print(f"{result['module']}: {result['wall_ms']} ms vs {old['wall_ms']} ms ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
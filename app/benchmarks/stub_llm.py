@@ -0,0 +1,180 @@
+"""OpenAI-compatible stub LLM server (and an in-process equivalent) for offline benchmarks.
+
+Usage:
+    python -m app.benchmarks.stub_llm --port 8089 --ttft-ms 50 --token-ms 5 --tokens 64
+
+Answers every POST /v1/chat/completions with a canned reply after a fixed time to
+first token and per-token delay, streamed as SSE when the request asks for it.
+Point the app at it with LLM_API_BASE=http://127.0.0.1:8089/v1. StubChatModel gives
+the same replies and timings without HTTP.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+STUB_WORDS = (
+    "Based on the provided context, the condition is usually managed with rest, fluids and "
+    "medication prescribed by a physician, and symptoms that persist should be checked by a doctor."
+).split()
+
+
+def stub_answer(n_tokens):
+    return [("" if i == 0 else " ") + STUB_WORDS[i % len(STUB_WORDS)] for i in range(n_tokens)]
+
+
+class StubChatModel(BaseChatModel):
+    """In-process stand-in for the stub server; reports each token to callbacks like a streaming LLM"""
+
+    ttft: float = 0.05
+    token_delay: float = 0.005
+    n_tokens: int = 64
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.ttft)
+        tokens = stub_answer(self.n_tokens)
+        for token in tokens:
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            time.sleep(self.token_delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send_json(400, {"error": {"message": "Request body must be JSON"}})
+
+        self.server.count("requests")
+        model = request.get("model", "stub")
+        tokens = stub_answer(self.server.n_tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        time.sleep(self.server.ttft)
+        if request.get("stream"):
+            self._stream(completion_id, model, tokens)
+        else:
+            time.sleep(self.server.token_delay * len(tokens))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+
+    def _stream(self, completion_id, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        self._write_event(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            self._write_event(chunk({"content": token}))
+            time.sleep(self.server.token_delay)
+        self._write_event(chunk({}, "stop"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_event(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, ttft=0.05, token_delay=0.005, n_tokens=64):
+        super().__init__(address, StubLLMHandler)
+        self.ttft = ttft
+        self.token_delay = token_delay
+        self.n_tokens = n_tokens
+        self.counters = {"connections": 0, "requests": 0}
+        self._counter_lock = threading.Lock()
+
+    def count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    @property
+    def api_base(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def start_stub_server(host="127.0.0.1", port=0, **kwargs):
+    """Serves the stub on a background thread; port=0 picks a free port (see `api_base`)"""
+    server = StubLLMServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft-ms", type=float, default=50.0, help="Delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Delay between tokens")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per answer")
+    args = parser.parse_args()
+
+    server = StubLLMServer((args.host, args.port), ttft=args.ttft_ms / 1000, token_delay=args.token_ms / 1000, n_tokens=args.tokens)
+    print(f"Stub LLM listening on {server.api_base}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+
+from app.common.logger import LOGS_DIR, LOG_NAME_RE
+
+# Records per index block; a search reads only the blocks whose level counts and time span can match
+BLOCK_RECORDS = 500
+
+# Text lines start "2026-01-31 12:00:00,123456 - LEVEL - message"; JSON lines are objects with "time" and "level"
+_TEXT_RECORD_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\S* - ([A-Z]+) - ")
+
+LogRecord = namedtuple("LogRecord", ["offset", "time", "level", "text"])
+
+
+def list_log_files(log_dir=LOGS_DIR):
+    """Log file names, newest first (the file being written comes before its rolled-over parts)"""
+    if not os.path.isdir(log_dir):
+        return []
+
+    def order(name):
+        match = LOG_NAME_RE.match(name)
+        part = match.group(2)
+        return match.group(1), float("inf") if part is None else int(part)
+
+    return sorted((name for name in os.listdir(log_dir) if LOG_NAME_RE.match(name)), key=order, reverse=True)
+
+
+def parse_record_start(line):
+    """(time, level) if the line starts a log record, else None (a traceback or other continuation line)"""
+    match = _TEXT_RECORD_RE.match(line)
+    if match:
+        return match.group(1).decode(), match.group(2).decode()
+    if line.startswith(b"{"):
+        try:
+            entry = json.loads(line)
+            return entry["time"][:19].replace("T", " "), entry["level"]
+        except (ValueError, KeyError, TypeError):
+            return None
+    return None
+
+
+class _Block:
+    __slots__ = ("offset", "end", "first_time", "last_time", "levels", "records")
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.end = offset
+        self.first_time = None
+        self.last_time = None
+        self.levels = Counter()
+        self.records = 0
+
+
+class LogReader:
+    """Reads one log file from the end with paging and level/time/keyword filters.
+
+    An offset index of blocks of BLOCK_RECORDS records (byte range, time span and level counts)
+    is built once and extended incrementally as the file grows, so a filtered page only reads
+    the blocks that can contain matches, newest first, and stops as soon as the page is full.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = []
+        self.indexed_bytes = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Indexes whatever has been appended since the last call (re-indexes a replaced or truncated file)"""
+        with self._lock:
+            stat = os.stat(self.path)
+            if stat.st_ino != self._inode or stat.st_size < self.indexed_bytes:
+                self.blocks, self.indexed_bytes, self._inode = [], 0, stat.st_ino
+            if stat.st_size > self.indexed_bytes:
+                self._index_from(self.indexed_bytes)
+
+    def _index_from(self, start):
+        block = self.blocks.pop() if self.blocks and self.blocks[-1].records < BLOCK_RECORDS else None
+        if block is not None:
+            start = block.offset
+            block = _Block(start)
+
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a record still being written; picked up on the next refresh
+                started = parse_record_start(line)
+                if started is not None:
+                    if block is None or block.records >= BLOCK_RECORDS:
+                        if block is not None:
+                            self.blocks.append(block)
+                        block = _Block(offset)
+                    time_, level = started
+                    block.first_time = block.first_time or time_
+                    block.last_time = time_
+                    block.levels[level] += 1
+                    block.records += 1
+                elif block is None:
+                    block = _Block(offset)  # continuation lines at the very start of a file
+                offset += len(line)
+                block.end = offset
+
+        if block is not None:
+            self.blocks.append(block)
+        self.indexed_bytes = self.blocks[-1].end if self.blocks else 0
+
+    def level_counts(self):
+        self.refresh()
+        total = Counter()
+        for block in self.blocks:
+            total.update(block.levels)
+        return dict(total)
+
+    @staticmethod
+    def _parse_block(block, data):
+        records, current = [], None
+        offset = block.offset
+        for line in data.splitlines(keepends=True):
+            started = parse_record_start(line)
+            if started is not None or current is None:
+                if current is not None:
+                    records.append(current)
+                time_, level = started or (None, None)
+                current = [offset, time_, level, [line]]
+            else:
+                current[3].append(line)
+            offset += len(line)
+        if current is not None:
+            records.append(current)
+        return [
+            LogRecord(o, t, l, b"".join(lines).decode("utf-8", errors="replace").rstrip("\n"))
+            for o, t, l, lines in records
+        ]
+
+    def tail(self, limit=200, page=0, levels=None, search=None, since=None, until=None):
+        """Page `page` (0 = newest) of up to `limit` matching records, newest first, plus whether older matches exist.
+
+        `levels` is a collection of level names, `search` a case-insensitive substring and
+        `since` / `until` "YYYY-MM-DD HH:MM:SS" bounds (inclusive).
+        """
+        self.refresh()
+        levels = set(levels) if levels else None
+        needle = search.lower() if search else None
+        # bytes.lower() only folds ASCII, so the raw-block prefilter is limited to ASCII needles
+        needle_bytes = needle.encode() if needle and needle.isascii() else None
+        skip = page * limit
+        matches = []
+
+        with open(self.path, "rb") as f:
+            for block in reversed(self.blocks):
+                if levels is not None and not any(block.levels.get(level) for level in levels):
+                    continue
+                if since and block.last_time and block.last_time < since:
+                    break  # blocks are chronological, so everything older is out of range too
+                if until and block.first_time and block.first_time > until:
+                    continue
+
+                f.seek(block.offset)
+                data = f.read(block.end - block.offset)
+                if needle_bytes and needle_bytes not in data.lower():
+                    continue  # cheap byte scan before parsing records
+
+                for record in reversed(self._parse_block(block, data)):
+                    if levels is not None and record.level not in levels:
+                        continue
+                    if record.time and ((since and record.time < since) or (until and record.time > until)):
+                        continue
+                    if needle and needle not in record.text.lower():
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    if len(matches) == limit:
+                        return matches, True
+                    matches.append(record)
+
+        return matches, False
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_log_reader(path):
+    """Shared reader per file, so its index survives between calls (e.g. Streamlit reruns)"""
+    path = os.path.abspath(path)
+    with _readers_lock:
+        reader = _readers.get(path)
+        if reader is None:
+            reader = _readers[path] = LogReader(path)
+        return reader
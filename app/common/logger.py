@@ -1,6 +1,19 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
 from datetime import datetime, timedelta, timezone
+from logging.handlers import QueueHandler, BaseRotatingHandler
+
+from app.config.config import (
+    LOG_ASYNC, LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_FORMAT, LOG_MAX_BYTES, LOG_RETENTION_DAYS,
+)
 
 LOGS_DIR = "logs"
 os.makedirs(LOGS_DIR, exist_ok=True)
@@ -12,7 +25,13 @@ def get_ist_time():
     """Returns current time in IST"""
     return datetime.now(IST)
 
-LOG_FILE = os.path.join(LOGS_DIR, f"log_{get_ist_time().strftime('%Y-%m-%d')}.log")
+# log_<date>.log is the file being written; log_<date>.<n>.log are its earlier parts after size rollovers
+LOG_NAME_RE = re.compile(r"^log_(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.log$")
+
+def log_file_path(day, log_dir=LOGS_DIR):
+    return os.path.join(log_dir, f"log_{day.strftime('%Y-%m-%d')}.log")
+
+LOG_FILE = log_file_path(get_ist_time())
 
 # Custom Formatter to enforce IST
 class ISTFormatter(logging.Formatter):
@@ -31,19 +50,283 @@ class ISTFormatter(logging.Formatter):
                 s = dt.isoformat()
         return s
 
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "request_id", "taskName"}
+
+class JSONFormatter(ISTFormatter):
+    """One JSON object per line: time, level, logger, message, request_id and any `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update((key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+_request_id = ContextVar("request_id", default=None)
+
+def set_request_id(request_id):
+    """Tags log records from the current request (thread or task) with `request_id`; returns a reset token"""
+    return _request_id.set(request_id)
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+def get_request_id():
+    return _request_id.get()
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class LogStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+
+    def add(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+
+_exc_formatter = logging.Formatter()
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: when the queue is full the record is counted and dropped"""
+
+    def __init__(self, log_queue, stats):
+        super().__init__(log_queue)
+        self.stats = stats
+
+    def prepare(self, record):
+        # Render the message now, since args may change after the call returns; timestamps and the
+        # line format are left to the writer. Unlike QueueHandler.prepare this skips copying the record.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats.add("dropped")
+
+
+class RotatingLogFileHandler(BaseRotatingHandler):
+    """Appends to logs/log_<IST date>.log, moving to a new file at IST midnight.
+
+    Once the day's file reaches `max_bytes` it is renamed to log_<date>.<n>.log and a fresh
+    file is started. Files older than `retention_days` are deleted (0 keeps everything).
+    """
+
+    def __init__(self, log_dir=LOGS_DIR, max_bytes=LOG_MAX_BYTES, retention_days=LOG_RETENTION_DAYS):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.day = get_ist_time().date()
+        super().__init__(log_file_path(self.day, log_dir), "a", encoding="utf-8")
+        self._prune()
+
+    def shouldRollover(self, record):
+        if datetime.fromtimestamp(record.created, IST).date() > self.day:
+            return True
+        return bool(self.max_bytes) and self.stream is not None and self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        day = get_ist_time().date()
+        if day != self.day:
+            self.day = day
+            self.baseFilename = os.path.abspath(log_file_path(day, self.log_dir))
+            self._prune()
+        elif os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) >= self.max_bytes:
+            # Another process sharing the file may already have rolled it over; then we only reopen
+            os.replace(self.baseFilename, self._next_part_path())
+        self.stream = self._open()
+
+    def _next_part_path(self):
+        stem = self.baseFilename[:-len(".log")]
+        part = 1
+        while os.path.exists(f"{stem}.{part}.log"):
+            part += 1
+        return f"{stem}.{part}.log"
+
+    def _prune(self):
+        if not self.retention_days:
+            return
+        cutoff = (self.day - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        for name in os.listdir(self.log_dir):
+            match = LOG_NAME_RE.match(name)
+            if match and match.group(1) < cutoff:
+                try:
+                    os.remove(os.path.join(self.log_dir, name))
+                except OSError:
+                    pass
+
+
+def write_batch(handler, records):
+    """Formats a batch for one handler and writes it with a single write + flush"""
+    records = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+    if not records:
+        return
+    if not isinstance(handler, logging.StreamHandler):
+        for record in records:
+            handler.handle(record)
+        return
+    try:
+        text = "".join(handler.format(r) + handler.terminator for r in records)
+        with handler.lock:
+            # Rotation is checked once per batch rather than per record
+            if isinstance(handler, BaseRotatingHandler) and handler.shouldRollover(records[-1]):
+                handler.doRollover()
+            handler.stream.write(text)
+            handler.flush()
+    except Exception:
+        handler.handleError(records[0])
+
+
+_STOP = object()
+# At most one "dropped records" warning per interval (seconds) while the queue is overflowing
+DROP_REPORT_INTERVAL = 5
+
+class BatchingLogWriter:
+    """Background thread that drains the log queue and hands records to the real handlers in batches"""
+
+    def __init__(self, log_queue, handlers, stats, batch_size=LOG_BATCH_SIZE):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.stats = stats
+        self.batch_size = batch_size
+        self._reported_drops = 0
+        self._reported_at = 0.0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            if record is _STOP:
+                self._flush_drop_report()
+                break
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._report_drops(batch, force=stopping)
+            self._write(batch)
+
+    def _write(self, batch):
+        for handler in self.handlers:
+            write_batch(handler, batch)
+        self.stats.add("written", len(batch))
+        self.stats.add("batches")
+
+    def _flush_drop_report(self):
+        batch = []
+        self._report_drops(batch, force=True)
+        if batch:
+            self._write(batch)
+
+    def _report_drops(self, batch, force=False):
+        dropped = self.stats.dropped
+        now = time.monotonic()
+        if dropped > self._reported_drops and (force or now - self._reported_at >= DROP_REPORT_INTERVAL):
+            batch.append(logging.makeLogRecord({
+                "name": __name__, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": f"Log queue full: dropped {dropped - self._reported_drops} records", "request_id": None,
+            }))
+            self._reported_drops = dropped
+            self._reported_at = now
+
+    def stop(self, timeout=5):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+
 # Configure Root Logger
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # File Handler
-file_handler = logging.FileHandler(LOG_FILE)
-file_handler.setFormatter(ISTFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S,%f'))
-logger.addHandler(file_handler)
+file_handler = RotatingLogFileHandler()
+if LOG_FORMAT == "json":
+    file_handler.setFormatter(JSONFormatter())
+else:
+    file_handler.setFormatter(ISTFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S,%f'))
 
 # Stream Handler (Optional: imports to console for debugging)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(ISTFormatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S,%f'))
-logger.addHandler(console_handler)
+
+stats = LogStats()
+_writer = None
+
+if LOG_ASYNC:
+    # Request threads only enqueue; formatting, timezone conversion and disk/console I/O happen on the writer
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE), stats)
+    queue_handler.addFilter(RequestContextFilter())
+    logger.addHandler(queue_handler)
+    _writer = BatchingLogWriter(queue_handler.queue, [file_handler, console_handler], stats)
+    _writer.start()
+    atexit.register(_writer.stop)
+
+    def _restart_writer_in_child():
+        # A forked worker inherits the queue but not the writer thread
+        global _writer
+        stats._lock = threading.Lock()
+        queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _writer = BatchingLogWriter(queue_handler.queue, [file_handler, console_handler], stats)
+        _writer.start()
+        atexit.register(_writer.stop)
+        # multiprocessing workers leave through os._exit, which skips atexit but runs these finalizers
+        mp_util = sys.modules.get("multiprocessing.util")
+        if mp_util is not None:
+            mp_util.Finalize(None, _writer.stop, exitpriority=0)
+
+    os.register_at_fork(after_in_child=_restart_writer_in_child)
+else:
+    for handler in (file_handler, console_handler):
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
+
+def log_stats():
+    return {
+        "mode": "async" if LOG_ASYNC else "sync",
+        "format": LOG_FORMAT,
+        "queued": _writer.queue.qsize() if _writer is not None else 0,
+        "dropped": stats.dropped,
+        "written": stats.written,
+        "batches": stats.batches,
+    }
 
 def get_logger(name):
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+from app.config.config import METRICS_WINDOW
+
+# Stage timings (ms) and recorded values of the request running in the current thread/task, for its log line
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class RollingHistogram:
+    """Keeps the last `window` samples (in seconds) and reports percentiles over them.
+
+    Samples are reported multiplied by `scale`, with keys suffixed by `unit`.
+    """
+
+    def __init__(self, window=METRICS_WINDOW, unit="ms", scale=1000):
+        self.unit = unit
+        self.scale = scale
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64)
+            count = self.count
+
+        unit = self.unit
+        if not len(samples):
+            return {"count": count, f"p50_{unit}": None, f"p95_{unit}": None, f"p99_{unit}": None, f"mean_{unit}": None}
+
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * self.scale
+        return {
+            "count": count,
+            f"p50_{unit}": round(float(p50), 2),
+            f"p95_{unit}": round(float(p95), 2),
+            f"p99_{unit}": round(float(p99), 2),
+            f"mean_{unit}": round(float(samples.mean() * self.scale), 2),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, unit="ms", scale=1000):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, RollingHistogram(self.window, unit, scale))
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = round(stages.get(name, 0.0) + seconds * 1000, 2)
+
+    def record(self, name, value, unit):
+        """A per-request quantity that isn't a latency (e.g. prompt tokens), reported in `unit`.
+
+        Like stage timings, values recorded more than once in a request scope (one per
+        question of a batch) add up in its log line; the histogram keeps each value.
+        """
+        self.histogram(name, unit, scale=1).observe(value)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0) + value
+
+    @contextmanager
+    def request_scope(self):
+        """Collects every stage observed until exit into the yielded dict, as well as the histograms"""
+        stages = {}
+        token = _request_stages.set(stages)
+        try:
+            yield stages
+        finally:
+            _request_stages.reset(token)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(self._histograms)
+        return {name: self._histograms[name].snapshot() for name in names}
+
+
+metrics = MetricsRegistry()
+
+
+def get_metrics():
+    return metrics
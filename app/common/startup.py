@@ -0,0 +1,64 @@
+import importlib
+import threading
+import time
+
+from app.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Heavy dependencies in the order the QA engine pulls them in; each timing is the cost on top of the previous ones
+PRELOAD_MODULES = (
+    "numpy",
+    "faiss",
+    "langchain_core.callbacks",
+    "langchain.chains",
+    "langchain_community.vectorstores",
+    "langchain_openai",
+    "app.components.qa_engine",
+)
+
+
+class StartupTimer:
+    """Records when start-up phases finished and how long deferred imports took, relative to process start"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = {}
+        self.imports = {}
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def mark(self, phase):
+        """Records the first time a phase is reached"""
+        with self._lock:
+            self.phases.setdefault(phase, round(self.elapsed(), 3))
+
+    def import_module(self, name):
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        with self._lock:
+            self.imports.setdefault(name, round((time.perf_counter() - start) * 1000, 1))
+        return module
+
+    def preload(self, modules=PRELOAD_MODULES):
+        """Imports the heavy dependencies one by one so the report shows what each costs"""
+        for name in modules:
+            try:
+                self.import_module(name)
+            except Exception as e:
+                logger.warning(f"Preloading {name} failed: {e}")
+        self.mark("imports_loaded")
+        logger.info(f"Deferred imports (ms): {self.imports}")
+
+    def report(self):
+        with self._lock:
+            return {
+                "uptime_seconds": round(self.elapsed(), 3),
+                "phases": dict(self.phases),
+                "imports_ms": dict(self.imports),
+            }
+
+
+startup = StartupTimer()
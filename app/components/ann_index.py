@@ -0,0 +1,117 @@
+import faiss
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+
+from app.config.config import (
+    VECTOR_INDEX_TYPE, IVF_NLIST, IVF_NPROBE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, PQ_M, PQ_NBITS,
+    INGEST_TRAIN_SAMPLE,
+)
+
+logger = get_logger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "ivfpq")
+
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def default_index_params():
+    return {
+        "nlist": IVF_NLIST,
+        "nprobe": IVF_NPROBE,
+        "hnsw_m": HNSW_M,
+        "ef_construction": HNSW_EF_CONSTRUCTION,
+        "ef_search": HNSW_EF_SEARCH,
+        "pq_m": PQ_M,
+        "pq_nbits": PQ_NBITS,
+    }
+
+
+def create_faiss_index(dim, n_vectors=None, index_type=VECTOR_INDEX_TYPE, params=None):
+    """Builds an empty (possibly untrained) L2 index of the requested type.
+
+    With n_vectors known, IVF list counts are clamped to what the corpus can train,
+    and PQ falls back to flat when there are too few vectors to fit its codebooks.
+    """
+    params = {**default_index_params(), **(params or {})}
+
+    if index_type not in INDEX_TYPES:
+        raise CustomException(f"Unknown VECTOR_INDEX_TYPE '{index_type}', expected one of {INDEX_TYPES}")
+
+    if index_type in ("pq", "ivfpq") and dim % params["pq_m"] != 0:
+        raise CustomException(f"PQ_M={params['pq_m']} must divide the embedding dimension {dim}")
+
+    nlist = params["nlist"]
+    if n_vectors is not None:
+        if index_type in ("pq", "ivfpq") and n_vectors < 2 ** params["pq_nbits"]:
+            logger.warning(f"Only {n_vectors} vectors, too few to train PQ codebooks; using a flat index")
+            index_type = "flat"
+        nlist = max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+        if index_type in ("ivf", "ivfpq") and nlist != params["nlist"]:
+            logger.warning(f"Clamped IVF nlist from {params['nlist']} to {nlist} for {n_vectors} vectors")
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+    elif index_type == "ivfpq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, params["pq_m"], params["pq_nbits"])
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    else:
+        index = faiss.IndexPQ(dim, params["pq_m"], params["pq_nbits"])
+
+    apply_search_params(index, params)
+    logger.info(f"Created FAISS {index_type} index ({type(index).__name__}, dim={dim})")
+    return index
+
+
+def apply_search_params(index, params=None):
+    """Sets query-time knobs (nprobe / efSearch) from config on a freshly built or loaded index"""
+    params = {**default_index_params(), **(params or {})}
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(params["nprobe"], ivf.nlist)
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = params["ef_search"]
+
+    return index
+
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    return "flat"
+
+
+def supports_removal(index):
+    """True when remove_ids() compacts rows, which LangChain's FAISS.delete() relies on.
+
+    Flat and PQ indexes shift later rows down; IVF keeps the old row ids and HNSW
+    can't remove at all, so those need a rebuild instead.
+    """
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def training_sample_size(index, max_sample=INGEST_TRAIN_SAMPLE):
+    """How many vectors to buffer before training; 0 when the index needs no training.
+
+    Capped at max_sample, but never below MIN_POINTS_PER_CENTROID for the largest
+    codebook, so memory stays bounded when the corpus size isn't known up front.
+    """
+    if index.is_trained:
+        return 0
+    ivf = faiss.try_extract_index_ivf(index)
+    ideal = ivf.nlist * 256 if ivf is not None else 256 * 256
+    centroids = max(ivf.nlist if ivf is not None else 0, index.pq.ksub if hasattr(index, "pq") else 0)
+    return min(ideal, max(max_sample, centroids * MIN_POINTS_PER_CENTROID))
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.common.logger import get_logger
+
+from app.config.config import (
+    DB_FAISS_PATH, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+logger = get_logger(__name__)
+
+
+def normalize_question(question):
+    """Ignores case and whitespace but keeps punctuation, which can matter ("HIV+" / "HIV-", "<5 mg" / ">5 mg")"""
+    return " ".join(question.casefold().split())
+
+
+def index_fingerprint(db_path=DB_FAISS_PATH):
+    """Changes whenever the FAISS index on disk is rewritten"""
+    try:
+        return os.stat(os.path.join(db_path, "index.faiss")).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _Entry:
+    __slots__ = ("result", "vector", "expires_at")
+
+    def __init__(self, result, vector, expires_at):
+        self.result = result
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """LRU + TTL cache of QA answers keyed by normalized question text.
+
+    With an embed function and a similarity threshold, a miss on the exact key
+    falls back to the most similar cached question by cosine similarity.
+    The cache empties itself when the FAISS index on disk changes.
+    """
+
+    def __init__(self, embed_fn=None, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD, fingerprint_fn=index_fingerprint):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.fingerprint_fn = fingerprint_fn
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._fingerprint = fingerprint_fn()
+
+    @property
+    def semantic_enabled(self):
+        return self.embed_fn is not None and self.similarity_threshold > 0
+
+    def _embed(self, question):
+        return self._normalize(self.embed_fn(question))
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_fingerprint(self):
+        fingerprint = self.fingerprint_fn()
+        if fingerprint != self._fingerprint:
+            logger.info("Vector store changed on disk, clearing answer cache")
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, question, vector=None):
+        """`vector` is the question's embedding if the caller already has it"""
+        return self.lookup(question, vector)[0]
+
+    def lookup(self, question, vector=None):
+        """(cached result or None, the question's embedding if one was computed or given) for reuse by retrieval"""
+        key = normalize_question(question)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_fingerprint()
+
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.result, vector
+
+            if not self.semantic_enabled or not self._entries:
+                self.misses += 1
+                return None, vector
+
+            self._evict_expired(now)
+            keys = [k for k, e in self._entries.items() if e.vector is not None]
+
+        if not keys:
+            with self._lock:
+                self.misses += 1
+            return None, vector
+
+        # Embedding runs outside the lock so concurrent lookups don't serialize on the model
+        if vector is None:
+            vector = self.embed_fn(question)
+        normalized = self._normalize(vector)
+
+        with self._lock:
+            candidates = [(k, self._entries[k]) for k in keys if k in self._entries]
+            if candidates:
+                similarities = np.stack([e.vector for _, e in candidates]) @ normalized
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    best_key, best_entry = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return best_entry.result, vector
+
+            self.misses += 1
+            return None, vector
+
+    def put(self, question, result, vector=None):
+        key = normalize_question(question)
+        if self.semantic_enabled:
+            vector = self._embed(question) if vector is None else self._normalize(vector)
+        else:
+            vector = None
+
+        with self._lock:
+            self._entries[key] = _Entry(result, vector, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint = self.fingerprint_fn()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
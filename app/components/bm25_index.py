@@ -0,0 +1,149 @@
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from app.components.mmap_store import index_signature, atomic_output
+
+from app.common.logger import get_logger
+
+from app.config.config import DB_FAISS_PATH, BM25_K1, BM25_B
+
+logger = get_logger(__name__)
+
+OFFSETS_FILE = "bm25.offsets.npy"
+ROWS_FILE = "bm25.rows.npy"
+WEIGHTS_FILE = "bm25.weights.npy"
+VOCAB_FILE = "bm25.vocab.json"
+META_FILE = "bm25.meta.json"
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its "
+    "of on or should that the their there these they this to was what when where which who "
+    "why will with you your".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def export_bm25_index(db, path=DB_FAISS_PATH, k1=BM25_K1, b=BM25_B):
+    """Writes a BM25 inverted index over the store's chunks, with postings keyed by FAISS row.
+
+    Postings are stored term-major (offsets/rows/weights, CSR style) with the full BM25
+    term weight precomputed, so a query only sums a few memory-mapped slices.
+    """
+    ntotal = db.index.ntotal
+    postings = {}
+    doc_lengths = np.zeros(ntotal, dtype=np.float32)
+
+    for row in range(ntotal):
+        doc = db.docstore.search(db.index_to_docstore_id[row])
+        counts = Counter(tokenize(doc.page_content))
+        doc_lengths[row] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((row, tf))
+
+    avgdl = float(doc_lengths.mean()) if ntotal and doc_lengths.mean() > 0 else 1.0
+    vocab = {term: i for i, term in enumerate(sorted(postings))}
+
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for term, i in vocab.items():
+        offsets[i + 1] = len(postings[term])
+    offsets = np.cumsum(offsets)
+
+    rows = np.empty(offsets[-1], dtype=np.int32)
+    weights = np.empty(offsets[-1], dtype=np.float32)
+    for term, i in vocab.items():
+        term_rows, tfs = zip(*postings[term])
+        term_rows = np.array(term_rows, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float32)
+        idf = np.log(1 + (ntotal - len(term_rows) + 0.5) / (len(term_rows) + 0.5))
+        norm = tfs + k1 * (1 - b + b * doc_lengths[term_rows] / avgdl)
+        rows[offsets[i]:offsets[i + 1]] = term_rows
+        weights[offsets[i]:offsets[i + 1]] = idf * tfs * (k1 + 1) / norm
+
+    for name, array in ((OFFSETS_FILE, offsets), (ROWS_FILE, rows), (WEIGHTS_FILE, weights)):
+        with atomic_output(os.path.join(path, name)) as tmp_path:
+            np.save(tmp_path, array)
+    with atomic_output(os.path.join(path, VOCAB_FILE)) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(vocab, f, ensure_ascii=False)
+
+    # Written last: ties the postings to the exact index.faiss whose rows they reference
+    with atomic_output(os.path.join(path, META_FILE)) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"ntotal": ntotal, "k1": k1, "b": b, "avgdl": avgdl, **index_signature(path)}, f)
+
+    logger.info(f"Exported BM25 index: {len(vocab)} terms, {len(rows)} postings over {ntotal} chunks")
+
+
+class BM25Index:
+    """Read-only BM25 index over memory-mapped postings"""
+
+    def __init__(self, offsets, rows, weights, vocab, ntotal):
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.vocab = vocab
+        self.ntotal = ntotal
+
+    @classmethod
+    def load(cls, path=DB_FAISS_PATH):
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            offsets=np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r"),
+            rows=np.load(os.path.join(path, ROWS_FILE), mmap_mode="r"),
+            weights=np.load(os.path.join(path, WEIGHTS_FILE), mmap_mode="r"),
+            vocab=vocab,
+            ntotal=meta["ntotal"],
+        )
+
+    def search(self, query, k):
+        """Returns up to k (row, score) pairs, best first; rows with no query term are left out"""
+        term_ids = {self.vocab[term] for term in tokenize(query) if term in self.vocab}
+        if not term_ids or not self.ntotal:
+            return []
+
+        slices = [slice(self.offsets[i], self.offsets[i + 1]) for i in term_ids]
+        rows = np.concatenate([self.rows[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        scores = np.bincount(rows, weights=weights, minlength=self.ntotal)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(row), float(scores[row])) for row in matched]
+
+
+def has_bm25_index(path=DB_FAISS_PATH):
+    meta_file = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_file) or not os.path.exists(os.path.join(path, "index.faiss")):
+        return False
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return all(meta.get(key) == value for key, value in index_signature(path).items())
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable BM25 metadata: {e}")
+        return False
+
+
+def load_bm25_index(path=DB_FAISS_PATH):
+    """The BM25 index saved with the current index.faiss, or None if missing or stale"""
+    if not has_bm25_index(path):
+        return None
+    try:
+        return BM25Index.load(path)
+    except Exception as e:
+        logger.warning(f"Failed to load BM25 index: {e}")
+        return None
@@ -0,0 +1,164 @@
+import re
+import threading
+from functools import lru_cache
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.common.logger import get_logger
+from app.common.metrics import metrics
+
+from app.config.config import CONTEXT_TOKENIZER, CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD, CHUNK_OVERLAP
+
+logger = get_logger(__name__)
+
+# Rough characters per token of English text, used when no tokenizer can be loaded
+APPROX_CHARS_PER_TOKEN = 4
+# Shortest shared boundary (in characters) treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# The stuff chain joins documents with "\n\n"
+DOCUMENT_SEPARATOR = "\n\n"
+
+
+def load_token_counter(name=CONTEXT_TOKENIZER):
+    """Token-counting function for a tiktoken encoding name or a tokenizer.json file.
+
+    Falls back to a characters/4 estimate when neither can be loaded (e.g. the tiktoken
+    encoding isn't cached and there is no network).
+    """
+    try:
+        if name.endswith(".json"):
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(name)
+            count = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        else:
+            import tiktoken
+            encoding = tiktoken.get_encoding(name)
+            count = lambda text: len(encoding.encode_ordinary(text))
+        count("warm-up")
+        logger.info(f"Counting context tokens with {name}")
+        return lru_cache(maxsize=8192)(count)
+    except Exception as e:
+        logger.warning(f"Tokenizer {name} unavailable ({e}); estimating {APPROX_CHARS_PER_TOKEN} characters per token")
+        return lambda text: -(-len(text) // APPROX_CHARS_PER_TOKEN)
+
+
+def _shingles(text, n=3):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+
+
+def _boundary_overlap(earlier, later, max_chars):
+    """Length of the longest suffix of `earlier` that starts `later` (at least MIN_OVERLAP_CHARS, at most max_chars)"""
+    for size in range(min(max_chars, len(earlier), len(later)), MIN_OVERLAP_CHARS - 1, -1):
+        if earlier.endswith(later[:size]):
+            return size
+    return 0
+
+
+class ContextPacker:
+    """Fits retrieved chunks into a token budget for the "stuff" prompt.
+
+    Chunks arrive in relevance order. Near-duplicates of a chunk already packed are dropped,
+    text shared with a packed neighbour through the splitter's CHUNK_OVERLAP is trimmed, and
+    the rest are added greedily while they fit in `token_budget` context tokens.
+    """
+
+    def __init__(self, prompt_template="", token_budget=CONTEXT_TOKEN_BUDGET, dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+                 max_overlap_chars=CHUNK_OVERLAP, count_tokens=None):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.max_overlap_chars = max(max_overlap_chars * 2, MIN_OVERLAP_CHARS)
+        self.count_tokens = count_tokens or load_token_counter()
+        self.prompt_tokens = self.count_tokens(prompt_template.format(context="", question="")) if prompt_template else 0
+        self.separator_tokens = self.count_tokens(DOCUMENT_SEPARATOR)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "documents_in": 0, "documents_packed": 0, "dropped_duplicates": 0,
+                       "dropped_over_budget": 0, "trimmed_overlaps": 0, "truncated": 0}
+
+    def _is_duplicate(self, shingles, packed_shingles):
+        for other in packed_shingles:
+            shared = len(shingles & other)
+            if shared and shared / min(len(shingles), len(other)) >= self.dedup_threshold:
+                return True
+        return False
+
+    def _trim_overlap(self, text, packed_texts):
+        for other in packed_texts:
+            size = _boundary_overlap(other, text, self.max_overlap_chars)
+            if size:
+                return text[size:].lstrip(), True
+            size = _boundary_overlap(text, other, self.max_overlap_chars)
+            if size:
+                return text[:-size].rstrip(), True
+        return text, False
+
+    def _truncate(self, text, budget):
+        """Longest prefix of `text` (at least one character) that fits in `budget` tokens, by binary search"""
+        low, high = 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low]
+
+    def pack(self, question, documents):
+        """The documents to stuff into the prompt, in relevance order and within the budget"""
+        with metrics.timer("context_packing"):
+            counts = dict.fromkeys(self._stats, 0)
+            packed, packed_texts, packed_shingles = [], [], []
+            remaining = self.token_budget
+
+            for doc in documents:
+                text = doc.page_content.strip()
+                shingles = _shingles(text)
+                if not text or self._is_duplicate(shingles, packed_shingles):
+                    counts["dropped_duplicates"] += 1
+                    continue
+
+                text, trimmed = self._trim_overlap(text, packed_texts)
+                cost = self.count_tokens(text) + (self.separator_tokens if packed else 0)
+                if cost > remaining:
+                    if packed:
+                        counts["dropped_over_budget"] += 1
+                        continue
+                    # Even the most relevant chunk is over budget: keep its beginning rather than no context
+                    text = self._truncate(text, remaining)
+                    cost = self.count_tokens(text)
+                    counts["truncated"] += 1
+
+                counts["trimmed_overlaps"] += trimmed
+                packed.append(doc if text == doc.page_content else Document(page_content=text, metadata=doc.metadata))
+                packed_texts.append(text)
+                packed_shingles.append(shingles)
+                remaining -= cost
+
+            context_tokens = self.token_budget - remaining
+            metrics.record("prompt_tokens", self.prompt_tokens + self.count_tokens(question) + context_tokens, "tokens")
+
+        counts.update(requests=1, documents_in=len(documents), documents_packed=len(packed))
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+        return packed
+
+    def stats(self):
+        with self._lock:
+            return {"token_budget": self.token_budget, **self._stats}
+
+
+class PackedContextRetriever(BaseRetriever):
+    """Packs the base retriever's documents into the context token budget"""
+
+    base: Any
+    packer: Any
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        documents = self.base.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.packer.pack(query, documents)
+
+    def retrieve_batch(self, queries, vectors):
+        return [self.packer.pack(query, documents) for query, documents in zip(queries, self.base.retrieve_batch(queries, vectors))]
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+
+from app.config.config import (
+    CONVERSATION_STORE, CONVERSATION_DB_PATH, CONVERSATION_MAX_CONVERSATIONS, CONVERSATION_MAX_MESSAGES,
+)
+
+logger = get_logger(__name__)
+
+
+class InMemoryConversationStore:
+    """Per-process conversation history with LRU eviction of whole conversations.
+
+    Each conversation keeps at most `max_messages` messages (oldest dropped first).
+    """
+
+    def __init__(self, max_conversations=CONVERSATION_MAX_CONVERSATIONS, max_messages=CONVERSATION_MAX_MESSAGES):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._conversations = OrderedDict()
+
+    def append(self, conversation_id, *messages):
+        with self._lock:
+            history = self._conversations.setdefault(conversation_id, [])
+            self._conversations.move_to_end(conversation_id)
+            history.extend({"role": m["role"], "content": m["content"]} for m in messages)
+            if len(history) > self.max_messages:
+                del history[:len(history) - self.max_messages]
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evicted += 1
+
+    def count(self, conversation_id):
+        with self._lock:
+            return len(self._conversations.get(conversation_id, ()))
+
+    def recent(self, conversation_id, limit, offset=0):
+        """Up to `limit` messages in chronological order, skipping the `offset` newest"""
+        with self._lock:
+            history = self._conversations.get(conversation_id)
+            if history is None:
+                return []
+            self._conversations.move_to_end(conversation_id)
+            end = max(len(history) - offset, 0)
+            return list(history[max(end - limit, 0):end])
+
+    def clear(self, conversation_id):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "conversations": len(self._conversations), "evicted": self.evicted}
+
+
+class SQLiteConversationStore:
+    """Conversation history in a SQLite file, shared by every worker process on the host.
+
+    Conversations are evicted least-recently-used beyond `max_conversations`, and
+    each keeps at most `max_messages` messages.
+    """
+
+    def __init__(self, path=CONVERSATION_DB_PATH, max_conversations=CONVERSATION_MAX_CONVERSATIONS,
+                 max_messages=CONVERSATION_MAX_MESSAGES):
+        self.path = path
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS conversations_last_used ON conversations (last_used);
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                conversation_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, seq);
+        """)
+        self._db.commit()
+
+    def _touch(self, conversation_id):
+        self._db.execute(
+            "INSERT INTO conversations (id, last_used) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET last_used = excluded.last_used",
+            (conversation_id, time.time()),
+        )
+
+    def append(self, conversation_id, *messages):
+        with self._lock, self._db:
+            self._touch(conversation_id)
+            self._db.executemany(
+                "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                [(conversation_id, m["role"], m["content"]) for m in messages],
+            )
+            # Keep only the newest max_messages of this conversation
+            self._db.execute(
+                "DELETE FROM messages WHERE conversation_id = ? AND seq <= "
+                "(SELECT seq FROM messages WHERE conversation_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (conversation_id, conversation_id, self.max_messages),
+            )
+            stale = self._db.execute(
+                "SELECT id FROM conversations ORDER BY last_used DESC LIMIT -1 OFFSET ?", (self.max_conversations,)
+            ).fetchall()
+            if stale:
+                self._db.executemany("DELETE FROM messages WHERE conversation_id = ?", stale)
+                self._db.executemany("DELETE FROM conversations WHERE id = ?", stale)
+                self.evicted += len(stale)
+
+    def count(self, conversation_id):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)).fetchone()[0]
+
+    def recent(self, conversation_id, limit, offset=0):
+        """Up to `limit` messages in chronological order, skipping the `offset` newest"""
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (conversation_id, limit, offset),
+            ).fetchall()
+            if rows:
+                self._touch(conversation_id)
+        return [{"role": role, "content": content} for role, content in reversed(rows)]
+
+    def clear(self, conversation_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self._db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def stats(self):
+        with self._lock:
+            conversations = self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return {"backend": "sqlite", "conversations": conversations, "evicted": self.evicted}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if CONVERSATION_STORE == "sqlite":
+                    _store = SQLiteConversationStore()
+                elif CONVERSATION_STORE == "memory":
+                    _store = InMemoryConversationStore()
+                else:
+                    raise CustomException(f"Unknown CONVERSATION_STORE '{CONVERSATION_STORE}', expected 'memory' or 'sqlite'")
+                logger.info(f"Using {CONVERSATION_STORE} conversation store")
+    return _store
@@ -1,6 +1,5 @@
 import os
-from app.components.pdf_loader import load_pdf_files,create_text_chunks
-from app.components.vector_store import save_vector_store
+from app.components.vector_store import update_vector_store
 from app.config.config import DB_FAISS_PATH
 
 from app.common.logger import get_logger
@@ -8,15 +7,14 @@ from app.common.custom_exception import CustomException
 
 logger = get_logger(__name__)
 
-def process_and_store_pdfs():
+def process_and_store_pdfs(full_rebuild=False):
     try:
         logger.info("MAking the vectorstore....")
-        
-        documents = load_pdf_files()
 
-        text_chunks = create_text_chunks(documents)
+        db = update_vector_store(full_rebuild=full_rebuild)
 
-        save_vector_store(text_chunks)
+        if db is None:
+            raise CustomException("Vectorstore update returned nothing")
 
         logger.info("Vectorstore created sucesfully....")
 
@@ -26,4 +24,5 @@ def process_and_store_pdfs():
 
 
 if __name__=="__main__":
-    process_and_store_pdfs()
+    import sys
+    process_and_store_pdfs(full_rebuild="--full" in sys.argv)
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.common.logger import get_logger
+
+from app.config.config import EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+logger = get_logger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking; keep one process per cache there
+    fcntl = None
+
+CACHE_VERSION = 1
+DIGEST_SIZE = 16
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name, text):
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """On-disk (model, text hash) -> vector cache backed by memory-mapped arrays.
+
+    Slots live in three parallel files: key digests, vectors and last-use times.
+    When full, the least recently used slots are overwritten. Each hit re-checks
+    the digest stored in its slot, so a slot rewritten by another process is
+    treated as a miss instead of returning the wrong vector. Processes sharing the
+    cache serialize writes (and creation) through an flock on the "lock" file.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, model_name=EMBEDDING_MODEL_NAME, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._digests = None
+        self._vectors = None
+        self._last_used = None
+
+        self._open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.path, exist_ok=True)
+        # Opened per use: a descriptor inherited across fork would share the parent's lock
+        with open(self._file("lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self):
+        meta_file = self._file("meta.json")
+        if not os.path.exists(meta_file):
+            return
+
+        with self._file_lock(exclusive=False):
+            self._load(meta_file)
+
+    def _load(self, meta_file):
+        self._slots = {}
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta != self._meta(meta.get("dim")):
+                logger.info("Embedding cache settings changed, starting a fresh cache")
+                return
+            self._map(meta["dim"], mode="r+")
+        except Exception as e:
+            logger.warning(f"Embedding cache at {self.path} unreadable, starting a fresh cache: {e}")
+            self._digests = self._vectors = self._last_used = None
+            return
+
+        for slot in np.flatnonzero(self._last_used):
+            self._slots[self._digests[slot].tobytes()] = int(slot)
+
+        logger.info(f"Opened embedding cache with {len(self._slots)}/{self.max_entries} entries")
+
+    def _meta(self, dim):
+        return {"version": CACHE_VERSION, "model": self.model_name, "dim": dim, "capacity": self.max_entries}
+
+    def _map(self, dim, mode, suffix=""):
+        self._digests = np.memmap(self._file("keys.bin" + suffix), dtype=np.uint8, mode=mode, shape=(self.max_entries, DIGEST_SIZE))
+        self._vectors = np.memmap(self._file("vectors.f32" + suffix), dtype=np.float32, mode=mode, shape=(self.max_entries, dim))
+        self._last_used = np.memmap(self._file("last_used.f64" + suffix), dtype=np.float64, mode=mode, shape=(self.max_entries,))
+
+    def _create(self, dim):
+        """Called with the file lock held; adopts a cache another process created meanwhile"""
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            self._load(meta_file)
+            if self._vectors is not None and self._vectors.shape[1] == dim:
+                return
+
+        # Fresh files are built aside and renamed into place, so processes still mapping
+        # the old ones never see them truncated underneath them
+        tmp = f".tmp{os.getpid()}"
+        self._map(dim, mode="w+", suffix=tmp)
+        for array in (self._digests, self._vectors, self._last_used):
+            array.flush()
+        for name in ("keys.bin", "vectors.f32", "last_used.f64"):
+            os.replace(self._file(name + tmp), self._file(name))
+        self._map(dim, mode="r+")
+        with open(meta_file + tmp, "w", encoding="utf-8") as f:
+            json.dump(self._meta(dim), f)
+        os.replace(meta_file + tmp, meta_file)
+        self._slots = {}
+        logger.info(f"Created embedding cache at {self.path} (dim={dim}, capacity={self.max_entries})")
+
+    def __len__(self):
+        return len(self._slots)
+
+    def get_many(self, texts):
+        """Returns a cached vector or None for each text"""
+        results = [None] * len(texts)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self.misses += len(texts)
+                return results
+
+            with self._file_lock(exclusive=False):
+                self._read(texts, results, now)
+
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(texts) - found
+        return results
+
+    def _read(self, texts, results, now):
+        for i, text in enumerate(texts):
+            key = cache_key(self.model_name, text)
+            slot = self._slots.get(key)
+            if slot is None or self._digests[slot].tobytes() != key:
+                self._slots.pop(key, None)
+                continue
+            results[i] = self._vectors[slot].tolist()
+            self._last_used[slot] = now
+
+    def put_many(self, texts, vectors):
+        if not texts:
+            return
+
+        with self._lock, self._file_lock(exclusive=True):
+            if self._vectors is None:
+                self._create(len(vectors[0]))
+
+            keys = list(dict.fromkeys(cache_key(self.model_name, text) for text in texts))
+            by_key = {cache_key(self.model_name, text): vector for text, vector in zip(texts, vectors)}
+            keys = [key for key in keys if key not in self._slots][-self.max_entries:]
+            if not keys:
+                return
+
+            # Free slots have last_used == 0, so they are taken before any live entry is evicted
+            slots = np.argpartition(self._last_used, len(keys) - 1)[:len(keys)] if len(keys) < self.max_entries else np.arange(self.max_entries)
+
+            now = time.time()
+            for key, slot in zip(keys, slots):
+                old_key = self._digests[slot].tobytes()
+                if self._slots.get(old_key) == slot:
+                    del self._slots[old_key]
+                # Vector before key: a slot only ever carries a key once its vector is in place
+                self._digests[slot] = 0
+                self._vectors[slot] = by_key[key]
+                self._digests[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._last_used[slot] = now
+                self._slots[key] = int(slot)
+
+    def flush(self):
+        with self._lock:
+            for array in (self._digests, self._vectors, self._last_used):
+                if array is not None:
+                    array.flush()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an EmbeddingCache"""
+
+    def __init__(self, embeddings, cache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts, compute=None):
+        compute = compute or self.embeddings.embed_documents
+        vectors = self.cache.get_many(texts)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = compute([texts[i] for i in missing])
+            computed = [list(map(float, vector)) for vector in computed]
+            self.cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+
+        return vectors
+
+    def embed_query(self, text):
+        vector = self.cache.get_many([text])[0]
+        if vector is None:
+            vector = list(map(float, self.embeddings.embed_query(text)))
+            self.cache.put_many([text], [vector])
+        return vector
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name=EMBEDDING_MODEL_NAME):
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(model_name=model_name)
+    return _cache
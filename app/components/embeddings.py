@@ -1,20 +1,40 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-
 from app.common.logger import get_logger
 from app.common.custom_exception import CustomException
 
+from app.config.config import EMBEDDING_MODEL_NAME, EMBEDDING_CACHE_ENABLED, EMBEDDING_BACKEND, ONNX_QUANTIZED
+
 logger = get_logger(__name__)
 
-def get_embedding_model():
+def embedding_model_id(backend=EMBEDDING_BACKEND):
+    """Identifies the vectors a backend produces, so caches never mix fp32 and int8 embeddings"""
+    if backend == "onnx":
+        return f"{EMBEDDING_MODEL_NAME}@onnx-{'int8' if ONNX_QUANTIZED else 'fp32'}"
+    return EMBEDDING_MODEL_NAME
+
+def load_embedding_backend(backend=EMBEDDING_BACKEND):
+    if backend == "onnx":
+        from app.components.onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings()
+    if backend == "huggingface":
+        # Imported here so the ONNX backend never loads torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    raise CustomException(f"Unknown EMBEDDING_BACKEND '{backend}', expected 'huggingface' or 'onnx'")
+
+def get_embedding_model(use_cache=EMBEDDING_CACHE_ENABLED):
     try:
-        logger.info("Intializing our Huggingface embedding model")
+        logger.info(f"Intializing our {EMBEDDING_BACKEND} embedding model")
+
+        model = load_embedding_backend()
+        logger.info(f"{embedding_model_id()} embedding model loaded sucesfully....")
 
-        model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        logger.info("Huggingface embedding model loaded sucesfully....")
+        if use_cache:
+            from app.components.embedding_cache import CachedEmbeddings, get_embedding_cache
+            model = CachedEmbeddings(model, get_embedding_cache(embedding_model_id()))
 
         return model
-    
+
     except Exception as e:
         error_message=CustomException("Error occured while loading embedding model" , e)
         logger.error(str(error_message))
-        raise error_message
\ No newline at end of file
+        raise error_message
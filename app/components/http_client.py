@@ -0,0 +1,218 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+
+from app.common.logger import get_logger
+
+from app.config.config import (
+    LLM_POOL_SIZE, LLM_KEEPALIVE_EXPIRY, LLM_HTTP2, LLM_TIMEOUT, LLM_CONNECT_TIMEOUT,
+    LLM_MAX_RETRIES, LLM_RETRY_BACKOFF, LLM_RETRY_BACKOFF_MAX,
+)
+
+logger = get_logger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Failures where the server can't have started on the request (or dropped an idle keep-alive connection)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+
+
+class ConnectionStats:
+    """Counts requests against new TCP connections, so reuse = requests that found a pooled connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.retries = 0
+        self.failures = 0
+
+    def add(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+
+stats = ConnectionStats()
+
+
+def backoff_delay(attempt, response=None, base=LLM_RETRY_BACKOFF, cap=LLM_RETRY_BACKOFF_MAX):
+    """Full-jitter exponential backoff, or the server's Retry-After when it sends one (capped)"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), cap)
+            except ValueError:
+                pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _trace(event_name, info):
+    # httpcore fires this once per newly opened TCP connection
+    if event_name == "connection.connect_tcp.complete":
+        stats.add("new_connections")
+
+
+async def _async_trace(event_name, info):
+    _trace(event_name, info)
+
+
+class RetryTransport(httpx.BaseTransport):
+    """Retries connection failures and 429/5xx responses with jittered backoff, counting connections"""
+
+    def __init__(self, transport, max_retries=LLM_MAX_RETRIES):
+        self.transport = transport
+        self.max_retries = max_retries
+
+    def handle_request(self, request):
+        request.extensions["trace"] = _trace
+        for attempt in range(self.max_retries + 1):
+            stats.add("requests")
+            try:
+                response = self.transport.handle_request(request)
+            except RETRY_EXCEPTIONS as e:
+                if attempt == self.max_retries:
+                    stats.add("failures")
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, response)
+                response.read()  # drain the error body so the connection goes back to the pool
+                response.close()
+                logger.warning(f"LLM returned {response.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            stats.add("retries")
+            time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async twin of RetryTransport for ainvoke()"""
+
+    def __init__(self, transport, max_retries=LLM_MAX_RETRIES):
+        self.transport = transport
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request):
+        request.extensions["trace"] = _async_trace
+        for attempt in range(self.max_retries + 1):
+            stats.add("requests")
+            try:
+                response = await self.transport.handle_async_request(request)
+            except RETRY_EXCEPTIONS as e:
+                if attempt == self.max_retries:
+                    stats.add("failures")
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"LLM request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    return response
+                delay = backoff_delay(attempt, response)
+                await response.aread()
+                await response.aclose()
+                logger.warning(f"LLM returned {response.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+            stats.add("retries")
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """Gives each event loop its own pool: async connections can only be used on the loop that opened them"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._transports = weakref.WeakKeyDictionary()  # a closed loop's pool goes when the loop does
+        self._lock = threading.Lock()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = self.factory()
+        return transport
+
+    async def handle_async_request(self, request):
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _client_settings():
+    http2 = LLM_HTTP2
+    if http2 and not http2_available():
+        logger.warning("LLM_HTTP2 is set but the h2 package is missing; using HTTP/1.1 keep-alive")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=LLM_POOL_SIZE,
+        max_keepalive_connections=LLM_POOL_SIZE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+    return http2, limits
+
+
+def llm_timeout():
+    return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client():
+    """Process-wide pooled client shared by every LLM instance"""
+    with _clients_lock:
+        if "sync" not in _clients:
+            http2, limits = _client_settings()
+            transport = RetryTransport(httpx.HTTPTransport(http2=http2, limits=limits))
+            _clients["sync"] = httpx.Client(transport=transport, timeout=llm_timeout())
+            logger.info(f"Created LLM HTTP client (pool={LLM_POOL_SIZE}, http2={http2})")
+        return _clients["sync"]
+
+
+def get_async_http_client():
+    """Process-wide async client; its pool is kept per event loop, so it is safe to use from any loop"""
+    with _clients_lock:
+        if "async" not in _clients:
+            http2, limits = _client_settings()
+            transport = LoopLocalTransport(lambda: AsyncRetryTransport(httpx.AsyncHTTPTransport(http2=http2, limits=limits)))
+            _clients["async"] = httpx.AsyncClient(transport=transport, timeout=llm_timeout())
+        return _clients["async"]
+
+
+def http_stats():
+    return stats.snapshot()
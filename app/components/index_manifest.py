@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+
+from app.common.logger import get_logger
+
+from app.config.config import DB_FAISS_PATH, DATA_PATH
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def manifest_path(db_path=DB_FAISS_PATH):
+    return os.path.join(db_path, MANIFEST_FILE)
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_key(file_path, data_path=DATA_PATH):
+    """Manifest key for a source file: its path relative to the data directory"""
+    return os.path.relpath(file_path, data_path).replace(os.sep, "/")
+
+
+def chunk_id(key, position):
+    return f"{key}:{position}"
+
+
+def chunk_ids(key, count):
+    """Docstore IDs for a file's chunks; they form the range key:0 .. key:count-1"""
+    return [chunk_id(key, i) for i in range(count)]
+
+
+def load_manifest(db_path=DB_FAISS_PATH):
+    path = manifest_path(db_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest with unsupported version {manifest.get('version')}")
+            return None
+        return manifest
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return None
+
+
+def save_manifest(manifest, db_path=DB_FAISS_PATH):
+    os.makedirs(db_path, exist_ok=True)
+    path = manifest_path(db_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def new_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def diff_manifest(manifest, current_hashes):
+    """Splits files into (added_or_changed, removed_or_changed, unchanged) keys"""
+    known = manifest["files"] if manifest else {}
+
+    changed = [key for key, sha in current_hashes.items() if key in known and known[key]["sha256"] != sha]
+    added = [key for key in current_hashes if key not in known]
+    removed = [key for key in known if key not in current_hashes]
+    unchanged = [key for key in current_hashes if key in known and key not in changed]
+
+    return sorted(added + changed), sorted(removed + changed), sorted(unchanged)
@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from app.components.embeddings import get_embedding_model
+from app.components.embedding_cache import CachedEmbeddings
+from app.components.ann_index import create_faiss_index, training_sample_size
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+
+from app.config.config import (
+    EMBED_BATCH_SIZE, EMBED_WORKERS, EMBED_POOL, INGEST_QUEUE_SIZE, INGEST_CHECKPOINT_EVERY, INGEST_CHECKPOINT_PATH,
+)
+
+logger = get_logger(__name__)
+
+_STAGE_DONE = object()
+
+
+# Embedding model owned by each process-pool worker
+_worker_embedding_model = None
+
+def _init_embedding_worker():
+    global _worker_embedding_model
+    # The parent process owns the embedding cache; workers only compute misses
+    _worker_embedding_model = get_embedding_model(use_cache=False)
+
+def _embed_texts_in_worker(texts):
+    return _worker_embedding_model.embed_documents(texts)
+
+def make_embed_fn(embedding_model, pool=EMBED_POOL, workers=EMBED_WORKERS):
+    """Returns (embed_fn, shutdown); with pool="process" cache misses are embedded in worker processes"""
+    process_pool = None
+    compute = None
+    if pool == "process":
+        process_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_embedding_worker)
+        compute = lambda texts: process_pool.submit(_embed_texts_in_worker, texts).result()
+
+    def embed_fn(texts):
+        # Cache lookups stay in this process so only misses are shipped to the workers
+        if isinstance(embedding_model, CachedEmbeddings):
+            return embedding_model.embed_documents(texts, compute=compute)
+        return (compute or embedding_model.embed_documents)(texts)
+
+    def shutdown():
+        if process_pool is not None:
+            process_pool.shutdown(cancel_futures=True)
+
+    return embed_fn, shutdown
+
+
+class IndexAppender:
+    """Appends embedded batches to a FAISS store, creating a VECTOR_INDEX_TYPE index on first use.
+
+    Index types that need training hold batches back until enough vectors have
+    arrived; `ready` is False while such batches are pending.
+    """
+
+    def __init__(self, embedding_model, db=None, n_vectors=None):
+        self.embedding_model = embedding_model
+        self.db = db
+        self.n_vectors = n_vectors
+        self.pending = []
+
+    @property
+    def ready(self):
+        return not self.pending
+
+    def add(self, text_embeddings, metadatas, ids):
+        if self.db is None:
+            index = create_faiss_index(len(text_embeddings[0][1]), n_vectors=self.n_vectors)
+            self.db = FAISS(embedding_function=self.embedding_model, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+        if not self.db.index.is_trained:
+            self.pending.append((text_embeddings, metadatas, ids))
+            if self._pending_count() >= training_sample_size(self.db.index):
+                self._train_and_flush()
+            return
+
+        self.db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    def _pending_count(self):
+        return sum(len(text_embeddings) for text_embeddings, _, _ in self.pending)
+
+    def _train_and_flush(self):
+        vectors = np.array([vector for text_embeddings, _, _ in self.pending for _, vector in text_embeddings], dtype=np.float32)
+        logger.info(f"Training {type(self.db.index).__name__} on {len(vectors)} vectors")
+        self.db.index.train(vectors)
+        for text_embeddings, metadatas, ids in self.pending:
+            self.db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self.pending.clear()
+
+    def finish(self):
+        if self.pending:
+            # The whole corpus fit in the training buffer: size the index for what actually arrived
+            self.db.index = create_faiss_index(self.db.index.d, n_vectors=self._pending_count())
+            if not self.db.index.is_trained:
+                self._train_and_flush()
+            else:
+                for text_embeddings, metadatas, ids in self.pending:
+                    self.db.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                self.pending.clear()
+        return self.db
+
+
+def plan_signature(plan):
+    """Stable hash of what an ingestion run is meant to produce, used to match checkpoints"""
+    return hashlib.sha256(json.dumps(plan, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class IngestionCheckpoint:
+    """Partially built index plus how many chunks of the planned sequence it already holds"""
+
+    def __init__(self, signature, path=INGEST_CHECKPOINT_PATH):
+        self.signature = signature
+        self.path = path
+        self.progress_file = os.path.join(path, "progress.json")
+
+    def load(self, embedding_model):
+        if not os.path.exists(self.progress_file):
+            return None
+        try:
+            with open(self.progress_file, "r", encoding="utf-8") as f:
+                progress = json.load(f)
+            if progress.get("signature") != self.signature:
+                logger.info("Ignoring checkpoint from a different ingestion plan")
+                return None
+            db = FAISS.load_local(self.path, embedding_model, allow_dangerous_deserialization=True)
+            logger.info(f"Resuming ingestion from checkpoint at chunk {progress['chunks_done']}")
+            return db, progress["chunks_done"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint at {self.path}: {e}")
+            return None
+
+    def save(self, db, chunks_done):
+        os.makedirs(self.path, exist_ok=True)
+        # Progress is removed first and rewritten last so a crash mid-save never pairs it with a torn index
+        if os.path.exists(self.progress_file):
+            os.remove(self.progress_file)
+        db.save_local(self.path)
+        tmp_file = self.progress_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "chunks_done": chunks_done}, f)
+        os.replace(tmp_file, self.progress_file)
+        logger.info(f"Checkpointed ingestion at chunk {chunks_done}")
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class _StageFailure:
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _STAGE_DONE
+
+
+class IngestionPipeline:
+    """load -> split -> embed -> index append, connected by bounded queues.
+
+    `chunks` is a lazy iterable of (chunk, chunk_id) pairs: loading and splitting
+    happen as it is consumed on the producer thread. EMBED_WORKERS threads embed
+    batches, and the calling thread appends them to the index in sequence order.
+    Only a few batches are in memory at any time.
+    """
+
+    def __init__(self, embedding_model, db=None, n_vectors=None, checkpoint=None, batch_size=EMBED_BATCH_SIZE,
+                 workers=EMBED_WORKERS, pool=EMBED_POOL, queue_size=INGEST_QUEUE_SIZE, checkpoint_every=INGEST_CHECKPOINT_EVERY):
+        self.embedding_model = embedding_model
+        self.appender = IndexAppender(embedding_model, db=db, n_vectors=n_vectors)
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.pool = pool
+        self.queue_size = queue_size
+        self.checkpoint_every = checkpoint_every
+
+    def run(self, chunks, skip=0):
+        """Indexes every chunk after the first `skip` and returns the vector store"""
+        stop = threading.Event()
+        batch_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue(maxsize=self.queue_size)
+        embed_fn, shutdown_embed = make_embed_fn(self.embedding_model, pool=self.pool, workers=self.workers)
+
+        def produce():
+            try:
+                seq, batch = 0, []
+                for position, item in enumerate(chunks):
+                    if stop.is_set():
+                        return  # a later stage failed; stop loading and splitting the rest of the corpus
+                    if position < skip:
+                        continue
+                    batch.append(item)
+                    if len(batch) == self.batch_size:
+                        if not _put(batch_queue, (seq, batch), stop):
+                            return
+                        seq, batch = seq + 1, []
+                if batch:
+                    _put(batch_queue, (seq, batch), stop)
+            except Exception as e:
+                _put(result_queue, _StageFailure(e), stop)
+            finally:
+                for _ in range(self.workers):
+                    _put(batch_queue, _STAGE_DONE, stop)
+
+        def embed():
+            try:
+                while True:
+                    item = _get(batch_queue, stop)
+                    if item is _STAGE_DONE:
+                        break
+                    seq, batch = item
+                    vectors = embed_fn([chunk.page_content for chunk, _ in batch])
+                    _put(result_queue, (seq, batch, vectors), stop)
+            except Exception as e:
+                _put(result_queue, _StageFailure(e), stop)
+            finally:
+                _put(result_queue, _STAGE_DONE, stop)
+
+        threads = [threading.Thread(target=produce, name="ingest-split", daemon=True)]
+        threads += [threading.Thread(target=embed, name=f"ingest-embed-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        indexed = 0
+        last_checkpoint = 0
+        reorder = {}
+        next_seq = 0
+        finished_workers = 0
+
+        try:
+            while finished_workers < self.workers:
+                item = result_queue.get()
+                if item is _STAGE_DONE:
+                    finished_workers += 1
+                    continue
+                if isinstance(item, _StageFailure):
+                    raise CustomException("Ingestion stage failed", item.error)
+
+                seq, batch, vectors = item
+                reorder[seq] = (batch, vectors)
+
+                # Batches are appended strictly in sequence so a checkpoint covers a prefix of the plan
+                while next_seq in reorder:
+                    batch, vectors = reorder.pop(next_seq)
+                    text_embeddings = [(chunk.page_content, vector) for (chunk, _), vector in zip(batch, vectors)]
+                    metadatas = [chunk.metadata for chunk, _ in batch]
+                    ids = [chunk_id for _, chunk_id in batch]
+                    self.appender.add(text_embeddings, metadatas, ids if all(ids) else None)
+                    indexed += len(batch)
+                    next_seq += 1
+
+                    if self.checkpoint and self.appender.ready and indexed - last_checkpoint >= self.checkpoint_every:
+                        self.checkpoint.save(self.appender.db, skip + indexed)
+                        last_checkpoint = indexed
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            shutdown_embed()
+
+        db = self.appender.finish()
+
+        if isinstance(self.embedding_model, CachedEmbeddings):
+            self.embedding_model.cache.flush()
+            logger.info(f"Embedding cache: {self.embedding_model.cache.hits} hits, {self.embedding_model.cache.misses} misses")
+
+        elapsed = time.perf_counter() - start
+        throughput = indexed / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"Embedded {indexed} chunks in {elapsed:.2f}s ({throughput:.1f} chunks/sec)")
+
+        return db
@@ -1,5 +1,6 @@
 from langchain_huggingface import HuggingFaceEndpoint
-from app.config.config import HF_TOKEN,HUGGINGFACE_REPO_ID
+from app.config.config import HF_TOKEN,HUGGINGFACE_REPO_ID,LLM_API_BASE
+from app.components.http_client import get_http_client, get_async_http_client, llm_timeout
 
 from app.common.logger import get_logger
 from app.common.custom_exception import CustomException
@@ -8,16 +9,22 @@ logger = get_logger(__name__)
 
 from langchain_openai import ChatOpenAI
 
-def load_llm(huggingface_repo_id: str = HUGGINGFACE_REPO_ID , hf_token:str = HF_TOKEN):
+def load_llm(huggingface_repo_id: str = HUGGINGFACE_REPO_ID , hf_token:str = HF_TOKEN, api_base: str = LLM_API_BASE):
     try:
         logger.info(f"Loading LLM: {huggingface_repo_id}")
 
         llm = ChatOpenAI(
             model=huggingface_repo_id,
             openai_api_key=hf_token,
-            openai_api_base="https://router.huggingface.co/v1",
+            openai_api_base=api_base,
             temperature=0.3,
-            max_tokens=256
+            max_tokens=256,
+            streaming=True,
+            # Every instance shares one keep-alive pool; retries with jittered backoff live in its transport
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            request_timeout=llm_timeout(),
+            max_retries=0,
         )
 
         logger.info("LLM loaded sucesfully...")
@@ -0,0 +1,185 @@
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+
+from app.config.config import DB_FAISS_PATH
+
+logger = get_logger(__name__)
+
+INDEX_FILE = "index.faiss"
+BLOB_FILE = "docstore.blob"
+OFFSETS_FILE = "docstore.offsets.npy"
+META_FILE = "docstore.meta.json"
+
+
+def index_signature(path):
+    stat = os.stat(os.path.join(path, INDEX_FILE))
+    return {"index_size": stat.st_size, "index_mtime_ns": stat.st_mtime_ns}
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_output(file_path):
+    """Yields a temporary path to write `file_path` to; on success it is fsynced and renamed into place.
+
+    Other workers may have the old file memory-mapped. Writing it in place could SIGBUS them or
+    show them half-written data, whereas after a rename they keep reading the old inode until
+    they reload. The temporary name keeps the extension, since np.save appends ".npy" otherwise.
+    """
+    root, ext = os.path.splitext(file_path)
+    tmp_path = f"{root}.tmp{os.getpid()}{ext}"
+    try:
+        yield tmp_path
+        _fsync(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _fsync(os.path.dirname(file_path) or ".")
+
+
+def save_faiss_store(db, path=DB_FAISS_PATH):
+    """FAISS.save_local, but each file is swapped in atomically instead of rewritten in place"""
+    os.makedirs(path, exist_ok=True)
+    staging = os.path.join(path, f".staging{os.getpid()}")
+    try:
+        db.save_local(staging)
+        # index.pkl first: until index.faiss changes, the exports' signatures still match the old index
+        for name in ("index.pkl", INDEX_FILE):
+            with atomic_output(os.path.join(path, name)) as tmp_path:
+                os.replace(os.path.join(staging, name), tmp_path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def export_mmap_store(db, path=DB_FAISS_PATH):
+    """Writes the docstore as a JSON-record blob plus offsets, in FAISS row order"""
+    ntotal = db.index.ntotal
+    offsets = np.zeros(ntotal + 1, dtype=np.int64)
+
+    with atomic_output(os.path.join(path, BLOB_FILE)) as blob_path:
+        with open(blob_path, "wb") as blob:
+            for row in range(ntotal):
+                doc_id = db.index_to_docstore_id[row]
+                doc = db.docstore.search(doc_id)
+                record = {"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}
+                blob.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+                offsets[row + 1] = blob.tell()
+
+    with atomic_output(os.path.join(path, OFFSETS_FILE)) as offsets_path:
+        np.save(offsets_path, offsets)
+
+    # Written last: ties the blob to the exact index.faiss it was exported from
+    with atomic_output(os.path.join(path, META_FILE)) as meta_path:
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"ntotal": ntotal, **index_signature(path)}, f)
+
+    logger.info(f"Exported {ntotal} chunks to memory-mappable docstore")
+
+
+class RowIds(Mapping):
+    """index_to_docstore_id for row-addressed stores: FAISS row i maps to docstore id i"""
+
+    def __init__(self, ntotal):
+        self.ntotal = ntotal
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.ntotal:
+            raise KeyError(row)
+        return row
+
+    def __iter__(self):
+        return iter(range(self.ntotal))
+
+    def __len__(self):
+        return self.ntotal
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over a memory-mapped record blob.
+
+    The files are mapped when the store is constructed, together with the index, so a
+    rebuild that swaps in new files later doesn't change what this store reads; loading
+    the vector store again picks the new ones up. There is no delete(): a store is
+    changed by rebuilding it.
+    """
+
+    def __init__(self, path=DB_FAISS_PATH, ntotal=None):
+        self.path = path
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        if ntotal is not None and len(self._offsets) != ntotal + 1:
+            raise CustomException(f"Docstore has {len(self._offsets) - 1} records but the index has {ntotal} vectors")
+        with open(os.path.join(path, BLOB_FILE), "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def record(self, row):
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._blob[start:end])
+
+    def search(self, search):
+        try:
+            record = self.record(int(search))
+        except (ValueError, IndexError):
+            return f"ID {search} not found."
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+
+def has_mmap_store(path=DB_FAISS_PATH):
+    meta_file = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_file) or not os.path.exists(os.path.join(path, INDEX_FILE)):
+        return False
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        signature = index_signature(path)
+        return all(meta.get(key) == value for key, value in signature.items())
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable mmap docstore metadata: {e}")
+        return False
+
+
+def _read_index_mmap(index_file):
+    # Newer FAISS can mmap flat codes (IO_FLAG_MMAP_IFC); older ones only mmap IVF lists
+    flag_names = ["IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"]
+    for name in flag_names:
+        flag = getattr(faiss, name, None)
+        if flag is None:
+            continue
+        try:
+            return faiss.read_index(index_file, flag | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            logger.debug(f"FAISS {name} load failed: {e}")
+
+    logger.warning("FAISS build can't memory-map this index type, reading it into RAM")
+    return faiss.read_index(index_file)
+
+
+def load_mmap_vector_store(embedding_model, path=DB_FAISS_PATH):
+    index = _read_index_mmap(os.path.join(path, INDEX_FILE))
+    logger.info(f"Memory-mapped FAISS index with {index.ntotal} vectors")
+
+    return FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=MmapDocstore(path, ntotal=index.ntotal),
+        index_to_docstore_id=RowIds(index.ntotal),
+    )
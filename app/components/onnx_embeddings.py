@@ -0,0 +1,129 @@
+"""ONNX Runtime embedding backend for sentence-transformers models.
+
+Export the model once (needs torch, transformers and onnxruntime):
+    python -m app.components.onnx_embeddings --output models/all-MiniLM-L6-v2-onnx
+
+then serve it with EMBEDDING_BACKEND=onnx (ONNX_QUANTIZED=false for the fp32 file).
+Serving needs only onnxruntime and tokenizers.
+"""
+import argparse
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+
+from app.config.config import (
+    EMBEDDING_MODEL_NAME, ONNX_MODEL_PATH, ONNX_QUANTIZED, ONNX_THREADS, EMBEDDING_MAX_LENGTH, EMBED_BATCH_SIZE,
+)
+
+logger = get_logger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """Transformer forward pass in ONNX Runtime, then mean pooling and L2 normalization.
+
+    This reproduces the Transformer -> Pooling(mean) -> Normalize pipeline of
+    all-MiniLM-L6-v2, so vectors agree with HuggingFaceEmbeddings up to quantization error.
+    """
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, quantized=ONNX_QUANTIZED, threads=ONNX_THREADS,
+                 max_length=EMBEDDING_MAX_LENGTH, batch_size=EMBED_BATCH_SIZE):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = os.path.join(model_path, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_file):
+            raise CustomException(f"No ONNX model at {model_file}; export one with `python -m app.components.onnx_embeddings`")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]")
+        self.tokenizer.enable_padding(pad_id=pad_id if pad_id is not None else 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_file, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.model_file = model_file
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+        }
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feed)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Batching texts of similar length keeps padding (and wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def export_onnx_model(model_name=EMBEDDING_MODEL_NAME, output_path=ONNX_MODEL_PATH, quantize=True, opset=14):
+    """Exports the transformer of a sentence-transformers model plus its tokenizer, optionally int8-quantized"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_path, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    model_file = os.path.join(output_path, MODEL_FILE)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_file,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_path)
+    logger.info(f"Exported {model_name} to {model_file}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_file = os.path.join(output_path, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_file, quantized_file, weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8-quantized model to {quantized_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output", default=ONNX_MODEL_PATH)
+    parser.add_argument("--no-quantize", action="store_true", help="Skip writing the int8 model")
+    args = parser.parse_args()
+    export_onnx_model(args.model, args.output, quantize=not args.no_quantize)
@@ -1,14 +1,110 @@
 import os
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from app.common.logger import get_logger
 from app.common.custom_exception import CustomException
 
-from app.config.config import DATA_PATH, CHUNK_SIZE, CHUNK_OVERLAP
+from app.config.config import DATA_PATH, CHUNK_SIZE, CHUNK_OVERLAP, LOADER_WORKERS, LOADER_PAGES_PER_TASK
 
 logger = get_logger(__name__)
 
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+def list_data_files(data_path=DATA_PATH):
+    """Returns supported source files under data_path, sorted for a stable order"""
+    if not os.path.exists(data_path):
+        return []
+    return sorted(
+        os.path.join(data_path, name)
+        for name in os.listdir(data_path)
+        if name.lower().endswith(SUPPORTED_EXTENSIONS)
+    )
+
+def _pdf_page_count(file_path):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+def _load_pdf_pages(file_path, start, stop):
+    """Worker task: parses pages [start, stop) with the same metadata PyPDFLoader produces"""
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [
+        Document(page_content=reader.pages[page].extract_text(), metadata={"source": file_path, "page": page})
+        for page in range(start, stop)
+    ]
+
+def _load_text_file(file_path):
+    return TextLoader(file_path).load()
+
+def _plan_tasks(file_paths, pages_per_task, failed):
+    tasks = []
+    for file_path in file_paths:
+        if file_path.lower().endswith(".pdf"):
+            try:
+                page_count = _pdf_page_count(file_path)
+            except Exception as e:
+                error_message = CustomException(f"Failed to open {file_path}", e)
+                logger.error(str(error_message))
+                failed.add(file_path)
+                continue
+            for start in range(0, page_count, pages_per_task):
+                tasks.append((_load_pdf_pages, file_path, start, min(start + pages_per_task, page_count)))
+        else:
+            tasks.append((_load_text_file, file_path))
+    return tasks
+
+def iter_documents(file_paths, workers=LOADER_WORKERS, pages_per_task=LOADER_PAGES_PER_TASK, failed=None):
+    """Yields documents page by page, in file/page order, while later pages are still parsing.
+
+    PDFs are split into page ranges parsed across a process pool; only a bounded
+    window of tasks is in flight so memory doesn't grow with the corpus. Files that
+    fail to load (wholly or in part) are logged, skipped and added to the `failed` set.
+    """
+    failed = set() if failed is None else failed
+    tasks = _plan_tasks(file_paths, pages_per_task, failed)
+
+    if workers <= 1 or len(tasks) <= 1:
+        for fn, file_path, *args in tasks:
+            try:
+                yield from fn(file_path, *args)
+            except Exception as e:
+                error_message = CustomException(f"Failed to load {file_path}", e)
+                logger.error(str(error_message))
+                failed.add(file_path)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    in_flight = deque()
+    pending = iter(tasks)
+    try:
+        for fn, *args in islice(pending, workers * 2):
+            in_flight.append((args[0], executor.submit(fn, *args)))
+
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            next_task = next(pending, None)
+            if next_task is not None:
+                fn, *args = next_task
+                in_flight.append((args[0], executor.submit(fn, *args)))
+            try:
+                yield from future.result()
+            except Exception as e:
+                error_message = CustomException(f"Failed to load {file_path}", e)
+                logger.error(str(error_message))
+                failed.add(file_path)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def load_file(file_path):
+    documents = list(iter_documents([file_path]))
+    logger.info(f"Loaded {len(documents)} documents from {file_path}")
+    return documents
+
 def load_pdf_files():
     try:
         if not os.path.exists(DATA_PATH):
@@ -16,27 +112,12 @@ def load_pdf_files():
         
         logger.info(f"Loading files from {DATA_PATH}")
 
-        documents = []
-
-        # 1. Load PDFs
-        try:
-            pdf_loader = DirectoryLoader(DATA_PATH, glob="*.pdf", loader_cls=PyPDFLoader)
-            pdf_docs = pdf_loader.load()
-            if pdf_docs:
-                documents.extend(pdf_docs)
-                logger.info(f"Loaded {len(pdf_docs)} PDF documents")
-        except Exception as e:
-            logger.warning(f"Error loading PDFs: {e}")
-
-        # 2. Load Text Files (txt) - Added support for supplemental data
-        try:
-            txt_loader = DirectoryLoader(DATA_PATH, glob="*.txt", loader_cls=TextLoader)
-            txt_docs = txt_loader.load()
-            if txt_docs:
-                documents.extend(txt_docs)
-                logger.info(f"Loaded {len(txt_docs)} TXT documents")
-        except Exception as e:
-             logger.warning(f"Error loading TXT files: {e}")
+        # PDFs first, then supplemental text files
+        file_paths = list_data_files()
+        pdf_paths = [path for path in file_paths if path.lower().endswith(".pdf")]
+        txt_paths = [path for path in file_paths if not path.lower().endswith(".pdf")]
+
+        documents = list(iter_documents(pdf_paths + txt_paths))
 
         if not documents:
             logger.warning("No documents (PDF or TXT) were found")
@@ -69,3 +150,9 @@ def create_text_chunks(documents):
         error_message = CustomException("Failed to generate chunks", e)
         logger.error(str(error_message))
         return []
+
+def iter_text_chunks(documents):
+    """Splits documents one at a time so chunking can overlap with loading"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for document in documents:
+        yield from text_splitter.split_documents([document])
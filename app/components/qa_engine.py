@@ -0,0 +1,390 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.components.retriever import create_qa_chain, retriever_component, StageTimingHandler
+from app.components.vector_store import load_vector_store
+from app.components.answer_cache import AnswerCache, normalize_question
+from app.components.http_client import http_stats
+from app.components.single_flight import SingleFlight
+from app.components.query_vectors import query_vector_scope
+from app.components.remote_retrieval import RemoteEmbeddings, get_retrieval_client
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+from app.common.metrics import metrics
+from app.common.startup import startup
+
+from app.config.config import ANSWER_CACHE_ENABLED, BATCH_MAX_CONCURRENCY, RETRIEVAL_SERVER_ADDRESS
+
+logger = get_logger(__name__)
+
+WARMUP_QUERY = "What are the common symptoms of fever?"
+
+# vectorstore is None when a retrieval sidecar owns the index; embeddings are then computed there too
+EngineState = namedtuple("EngineState", ["chain", "vectorstore", "embeddings"])
+
+
+class _StreamRun:
+    """One streamed chain run; every stream asking the same question replays its tokens from the start"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.tokens = []
+        self.done = False
+        self.response = None
+        self.error = None
+        self.stages = {}
+
+    def put(self, token):
+        with self._cond:
+            self.tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, response=None, error=None):
+        with self._cond:
+            self.response, self.error, self.done = response, error, True
+            self._cond.notify_all()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self._cond:
+                while i == len(self.tokens) and not self.done:
+                    self._cond.wait()
+                if i == len(self.tokens):
+                    return
+                tokens = self.tokens[i:]
+            i += len(tokens)
+            yield from tokens
+
+
+def _known_vectors(question, vector):
+    return {question: vector} if vector is not None else {}
+
+
+class _TokenQueueHandler(BaseCallbackHandler):
+    def __init__(self, run):
+        self.run = run
+
+    def on_llm_new_token(self, token, **kwargs):
+        if token:
+            self.run.put(token)
+
+
+class AnswerStream:
+    """Yields answer tokens as the LLM produces them.
+
+    Once iteration finishes, `answer` holds the full result and `ttft` / `total_time`
+    hold the time to first token and the total time in seconds. `coalesced` is set when
+    the stream followed an identical question that was already being answered.
+    """
+
+    def __init__(self, engine, question):
+        self.engine = engine
+        self.question = question
+        self.answer = None
+        self.ttft = None
+        self.total_time = None
+        self.cached = False
+        self.coalesced = False
+
+    def __iter__(self):
+        start = time.perf_counter()
+        answer_cache = self.engine.answer_cache
+
+        cached, vector = answer_cache.lookup(self.question) if answer_cache is not None else (None, None)
+        if cached is not None:
+            self.cached = True
+            self.answer = cached
+            self.ttft = self.total_time = time.perf_counter() - start
+            metrics.observe("total", self.total_time)
+            yield cached
+            return
+
+        chain = self.engine.chain
+        key = normalize_question(self.question)
+        run, leader = self.engine._inflight_streams.attach(key, _StreamRun)
+        self.coalesced = not leader
+
+        def run_chain():
+            try:
+                with metrics.request_scope() as chain_stages, query_vector_scope(_known_vectors(self.question, vector)) as vectors:
+                    callbacks = [_TokenQueueHandler(run), StageTimingHandler()]
+                    response = chain.invoke({"query": self.question}, config={"callbacks": callbacks})
+                run.stages.update(chain_stages)
+                result = response.get("result")
+                if answer_cache is not None and result:
+                    answer_cache.put(self.question, result, vector=vectors.get(self.question))
+                run.finish(response=response)
+            except Exception as e:
+                run.finish(error=e)
+            finally:
+                self.engine._inflight_streams.forget(key, run)
+
+        if leader:
+            # The copied context carries the request id into the chain's log records
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(run_chain,), name="qa-stream", daemon=True).start()
+
+        streamed = False
+        for token in run.follow():
+            if not streamed:
+                self.ttft = time.perf_counter() - start
+                logger.info(f"Time to first token: {self.ttft * 1000:.0f} ms")
+                streamed = True
+            yield token
+
+        if run.error is not None:
+            raise run.error
+
+        self.answer = run.response.get("result", "")
+        if not streamed and self.answer:
+            # Provider didn't stream; hand over the whole answer at once
+            self.ttft = time.perf_counter() - start
+            yield self.answer
+
+        self.total_time = time.perf_counter() - start
+        metrics.observe("total", self.total_time)
+        stages = {**run.stages, "total": round(self.total_time * 1000, 2)}
+        logger.info(f"Streamed answer in {self.total_time * 1000:.0f} ms", extra={"stages": stages, "coalesced": self.coalesced})
+
+
+class QAEngine:
+    """Long-lived owner of the QA chain, shared by every request in the process"""
+
+    def __init__(self, answer_cache_enabled=ANSWER_CACHE_ENABLED):
+        self._lock = threading.Lock()
+        self._state = None
+        self.answer_cache = AnswerCache(embed_fn=self._embed_query) if answer_cache_enabled else None
+        # Concurrent identical questions (by normalized text) share one chain run
+        self._inflight = SingleFlight()
+        self._inflight_streams = SingleFlight()
+
+    @property
+    def state(self):
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._build_state()
+                    startup.mark("engine_ready")
+                state = self._state
+        return state
+
+    @property
+    def chain(self):
+        return self.state.chain
+
+    @property
+    def vectorstore(self):
+        return self.state.vectorstore
+
+    @property
+    def is_loaded(self):
+        return self._state is not None
+
+    def _build_state(self):
+        logger.info("Building QA engine...")
+        if RETRIEVAL_SERVER_ADDRESS:
+            db, embeddings = None, RemoteEmbeddings(get_retrieval_client())
+        else:
+            db = load_vector_store()
+            if db is None:
+                raise CustomException("Vector store not present or empty")
+            embeddings = db.embeddings
+
+        chain = create_qa_chain(db)
+        if chain is None:
+            raise CustomException("QA chain could not be created")
+
+        logger.info("QA engine ready")
+        return EngineState(chain, db, embeddings)
+
+    def _embed_query(self, question):
+        return self.state.embeddings.embed_query(question)
+
+    def warm_up(self):
+        """Loads the chain and runs one retrieval so the first user doesn't pay model init"""
+        try:
+            self.chain.retriever.invoke(WARMUP_QUERY)
+            logger.info("QA engine warm-up complete")
+            return True
+        except Exception as e:
+            error_message = CustomException("QA engine warm-up failed", e)
+            logger.error(str(error_message))
+            return False
+
+    def reload(self):
+        """Rebuilds the chain from the index on disk and swaps it in atomically"""
+        logger.info("Reloading QA engine from disk...")
+        if RETRIEVAL_SERVER_ADDRESS:
+            get_retrieval_client().reload()
+        state = self._build_state()
+        with self._lock:
+            self._state = state
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+        return state.chain
+
+    def invoke(self, question):
+        with metrics.request_scope() as stages:
+            with metrics.timer("total"):
+                response, coalesced = self._inflight.do(normalize_question(question), lambda: self._answer(question))
+        logger.info(f"Answered question in {stages['total']:.0f} ms", extra={"stages": stages, "coalesced": coalesced})
+        return {**response, "query": question}
+
+    def _answer(self, question):
+        vector = None
+        if self.answer_cache is not None:
+            cached, vector = self.answer_cache.lookup(question)
+            if cached is not None:
+                return {"query": question, "result": cached}
+
+        # Retrieval reuses the vector the cache lookup computed, and the cache write reuses retrieval's
+        with query_vector_scope(_known_vectors(question, vector)) as vectors:
+            response = self.chain.invoke({"query": question}, config={"callbacks": [StageTimingHandler()]})
+
+        result = response.get("result")
+        if self.answer_cache is not None and result:
+            self.answer_cache.put(question, result, vector=vectors.get(question))
+        return response
+
+    async def ainvoke(self, question):
+        """Async variant of invoke(); the LLM call is awaited and FAISS search runs in an executor"""
+        if not self.is_loaded:
+            await asyncio.to_thread(lambda: self.state)
+
+        with metrics.request_scope() as stages:
+            with metrics.timer("total"):
+                response, coalesced = await self._inflight.ado(normalize_question(question), lambda: self._aanswer(question))
+        logger.info(f"Answered question in {stages['total']:.0f} ms", extra={"stages": stages, "coalesced": coalesced})
+        return {**response, "query": question}
+
+    async def _aanswer(self, question):
+        vector = None
+        if self.answer_cache is not None:
+            cached, vector = await asyncio.to_thread(self.answer_cache.lookup, question)
+            if cached is not None:
+                return {"query": question, "result": cached}
+
+        with query_vector_scope(_known_vectors(question, vector)) as vectors:
+            response = await self.chain.ainvoke({"query": question}, config={"callbacks": [StageTimingHandler()]})
+
+        result = response.get("result")
+        if self.answer_cache is not None and result:
+            await asyncio.to_thread(self.answer_cache.put, question, result, vectors.get(question))
+        return response
+
+    def invoke_batch(self, questions, max_concurrency=BATCH_MAX_CONCURRENCY):
+        """Answers many questions with one embedding call and one vectorized FAISS search for the batch.
+
+        Repeated questions are answered once. LLM calls are fanned out over at most `max_concurrency`
+        threads. Results come back in input order; an item that fails carries an "error" instead of a "result".
+        """
+        state = self.state
+        results = [None] * len(questions)
+        pending = []
+        for i, question in enumerate(questions):
+            if isinstance(question, str) and question.strip():
+                pending.append(i)
+            else:
+                results[i] = {"query": question, "error": "Question must be a non-empty string"}
+
+        if not pending:
+            return results
+
+        # Repeats of a question (by normalized text) are embedded and answered once, then copied to each position
+        groups = {}
+        for i in pending:
+            groups.setdefault(normalize_question(questions[i]), []).append(i)
+        groups = list(groups.values())
+
+        def fill(group, outcome):
+            for i in group:
+                results[i] = {**outcome, "query": questions[i]}
+
+        with metrics.request_scope() as stages, metrics.timer("batch_total"):
+            with metrics.timer("batch_embedding"):
+                vectors = state.embeddings.embed_documents([questions[group[0]] for group in groups])
+
+            to_answer = []
+            for group, vector in zip(groups, vectors):
+                question = questions[group[0]]
+                cached = self.answer_cache.get(question, vector=vector) if self.answer_cache is not None else None
+                if cached is not None:
+                    fill(group, {"result": cached})
+                else:
+                    to_answer.append((group, vector))
+
+            if not to_answer:
+                return results
+
+            with metrics.timer("batch_retrieval"):
+                documents = state.chain.retriever.retrieve_batch(
+                    [questions[group[0]] for group, _ in to_answer], [vector for _, vector in to_answer]
+                )
+
+            def answer(i, vector, docs):
+                try:
+                    response = state.chain.combine_documents_chain.invoke(
+                        {"input_documents": docs, "question": questions[i]},
+                        config={"callbacks": [StageTimingHandler()]},
+                    )
+                    result = response.get("output_text")
+                    if self.answer_cache is not None and result:
+                        self.answer_cache.put(questions[i], result, vector=vector)
+                    return {"query": questions[i], "result": result}
+                except Exception as e:
+                    error_message = CustomException("Failed to answer batch question", e)
+                    logger.error(str(error_message))
+                    return {"query": questions[i], "error": str(e)}
+
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(to_answer))), thread_name_prefix="qa-batch") as pool:
+                futures = [(group, pool.submit(answer, group[0], vector, docs)) for (group, vector), docs in zip(to_answer, documents)]
+                for group, future in futures:
+                    fill(group, future.result())
+
+        logger.info(
+            f"Answered batch of {len(questions)} questions ({len(to_answer)} sent to the LLM)", extra={"stages": stages}
+        )
+        return results
+
+    def stats(self):
+        retriever = self._state.chain.retriever if self._state is not None else None
+        reranker = retriever_component(retriever, "reranker")
+        packer = retriever_component(retriever, "packer")
+        return {
+            "stages": metrics.snapshot(),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache is not None else None,
+            "rerank_cache": reranker.cache.stats() if reranker is not None else None,
+            "context_packing": packer.stats() if packer is not None else None,
+            "llm_http": http_stats(),
+            "coalescing": self.coalescing_stats(),
+            "retrieval_server": get_retrieval_client().stats() if RETRIEVAL_SERVER_ADDRESS else None,
+        }
+
+    def coalescing_stats(self):
+        calls, streams = self._inflight.stats(), self._inflight_streams.stats()
+        return {name: calls[name] + streams[name] for name in calls}
+
+    def stream(self, question):
+        return AnswerStream(self, question)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_qa_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = QAEngine()
+    return _engine
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Query embeddings already computed for the current request, keyed by query text
+_query_vectors = ContextVar("query_vectors", default=None)
+
+
+@contextmanager
+def query_vector_scope(vectors=None):
+    """Within the scope, retrievers reuse the embeddings in `vectors` and record the ones they compute.
+
+    Lets the answer cache, retrieval and the cache write share one embedding of the question.
+    """
+    vectors = {} if vectors is None else vectors
+    token = _query_vectors.set(vectors)
+    try:
+        yield vectors
+    finally:
+        _query_vectors.reset(token)
+
+
+def known_query_vector(query):
+    vectors = _query_vectors.get()
+    return vectors.get(query) if vectors is not None else None
+
+
+def embed_query(embed_fn, query):
+    """embed_fn(query), unless the current scope already has the vector"""
+    vectors = _query_vectors.get()
+    if vectors is None:
+        return embed_fn(query)
+    if query not in vectors:
+        vectors[query] = embed_fn(query)
+    return vectors[query]
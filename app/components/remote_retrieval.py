@@ -0,0 +1,237 @@
+import itertools
+import os
+import socket
+import threading
+import time
+import weakref
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+from app.common.metrics import metrics
+from app.components.query_vectors import known_query_vector
+
+from app.config.config import (
+    RETRIEVAL_SERVER_ADDRESS, RETRIEVAL_SERVER_AUTHKEY, RETRIEVAL_CONNECT_TIMEOUT, RETRIEVAL_TIMEOUT,
+    RETRIEVAL_RELOAD_TIMEOUT,
+)
+
+logger = get_logger(__name__)
+
+
+def parse_address(address):
+    """(address, family) for multiprocessing.connection: "host:port" is TCP, anything else a Unix socket path"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return (host, int(port)), "AF_INET"
+    return address, "AF_UNIX"
+
+
+def encode_authkey(authkey):
+    return authkey.encode() if authkey else None
+
+
+def socket_dir_is_private(path):
+    """Whether only this user (or root) can create files next to a Unix socket, so nobody else can bind its path"""
+    st = os.stat(os.path.dirname(os.path.abspath(path)))
+    return st.st_uid in (os.getuid(), 0) and not st.st_mode & 0o022
+
+
+def check_socket_dir(path, authkey):
+    # Without an authkey, a socket in a shared directory like /tmp could be pre-bound by another local user
+    if authkey is None and not socket_dir_is_private(path):
+        raise CustomException(f"{path} is in a directory other users can write to; "
+                              "use a private directory or set RETRIEVAL_SERVER_AUTHKEY")
+
+
+class RetrievalClient:
+    """Connection to the retrieval sidecar shared by every thread of a process.
+
+    Calls are tagged with an id and answered out of order by a reader thread, so
+    concurrent requests from one worker are in flight together and can land in the
+    same server-side batch.
+    """
+
+    def __init__(self, address=RETRIEVAL_SERVER_ADDRESS, authkey=RETRIEVAL_SERVER_AUTHKEY,
+                 connect_timeout=RETRIEVAL_CONNECT_TIMEOUT, timeout=RETRIEVAL_TIMEOUT, reload_timeout=RETRIEVAL_RELOAD_TIMEOUT):
+        self.address, self.family = parse_address(address)
+        self.authkey = encode_authkey(authkey)
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.reload_timeout = reload_timeout
+        self._ids = itertools.count()
+        self._reset()
+        # The engine holds this object (in RemoteRetriever and RemoteEmbeddings), so a forked worker
+        # must not inherit its parent's socket, pending calls or a lock some other thread held at fork time
+        client = weakref.ref(self)
+        os.register_at_fork(after_in_child=lambda: client() is not None and client()._reset(after_fork=True))
+
+    def _reset(self, after_fork=False):
+        if after_fork and self._conn is not None:
+            try:
+                self._conn.close()  # only this process's copy; the parent's connection stays up
+            except OSError:
+                pass
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pending = {}  # calls awaiting a reply on the current connection
+        self.calls = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                if self.family == "AF_UNIX":
+                    check_socket_dir(self.address, self.authkey)
+                conn = Client(self.address, family=self.family, authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+                # The sidecar only listens once its index is loaded; wait for it rather than fail at start-up
+                if time.monotonic() >= deadline:
+                    raise CustomException(f"Retrieval server not reachable at {self.address}", e)
+                time.sleep(0.2)
+            except AuthenticationError as e:
+                raise CustomException("Retrieval server rejected RETRIEVAL_SERVER_AUTHKEY", e)
+        logger.info(f"Connected to retrieval server at {self.address}")
+        pending = {}
+        threading.Thread(target=self._read_replies, args=(conn, pending), name="retrieval-client", daemon=True).start()
+        return conn, pending
+
+    def _read_replies(self, conn, pending):
+        """Answers the calls sent on `conn`; when it drops, fails those calls and no others"""
+        try:
+            while True:
+                call_id, ok, value = conn.recv()
+                with self._lock:
+                    future = pending.pop(call_id, None)
+                if future is None:
+                    continue  # the caller timed out
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(CustomException(f"Retrieval server error: {value}"))
+        except (EOFError, OSError) as e:
+            with self._lock:
+                if self._conn is conn:
+                    self._conn = None
+                lost = list(pending.values())
+                pending.clear()
+            for future in lost:
+                future.set_exception(CustomException("Lost connection to the retrieval server", e))
+            conn.close()
+
+    def _disconnect(self, conn):
+        # Closing the fd under the blocked reader could hand its number to the next connection;
+        # shutting the socket down instead wakes the reader with EOF, and the reader closes it
+        try:
+            with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def call(self, op, *args, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        with self._lock:
+            if self._conn is None:
+                if self.calls:
+                    self.reconnects += 1
+                self._conn, self._pending = self._connect()
+            conn, pending = self._conn, self._pending
+            call_id = next(self._ids)
+            pending[call_id] = future
+            self.calls += 1
+            try:
+                conn.send((call_id, op, args))
+            except OSError as e:
+                pending.pop(call_id, None)
+                self._conn = None
+                self._disconnect(conn)
+                raise CustomException("Failed to reach the retrieval server", e)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            with self._lock:
+                pending.pop(call_id, None)
+            raise CustomException(f"Retrieval server call '{op}' timed out after {timeout}s")
+
+    def embed(self, texts):
+        return self.call("embed", list(texts))
+
+    def retrieve(self, queries, vectors=None):
+        return self.call("retrieve", list(queries), vectors)
+
+    def reload(self):
+        return self.call("reload", timeout=self.reload_timeout)
+
+    def stats(self):
+        with self._lock:
+            client = {"address": str(self.address), "calls": self.calls, "reconnects": self.reconnects,
+                      "in_flight": len(self._pending)}
+        try:
+            return {"client": client, "server": self.call("stats")}
+        except CustomException as e:
+            return {"client": client, "server": None, "error": str(e)}
+
+    def close(self):
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            self._disconnect(conn)
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the retrieval sidecar's model"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed_documents(self, texts):
+        return self.client.embed(texts)
+
+    def embed_query(self, text):
+        return self.client.embed([text])[0]
+
+
+class RemoteRetriever(BaseRetriever):
+    """Retrieval (and rerank, if enabled there) done by the sidecar; stands in for the local first-stage retriever"""
+
+    client: Any
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        vector = known_query_vector(query)
+        with metrics.timer("remote_retrieval"):
+            return self.client.retrieve([query], None if vector is None else [vector])[0]
+
+    def retrieve_batch(self, queries, vectors):
+        return self.client.retrieve(queries, vectors)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_retrieval_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = RetrievalClient()
+    return _client
+
+
+def _reset_client_in_child():
+    # The client resets its own connection in the child; only the lock guarding its creation is left
+    global _client_lock
+    _client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_in_child)
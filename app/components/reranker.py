@@ -0,0 +1,134 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.components.embedding_cache import normalize_text
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+from app.common.metrics import metrics
+
+from app.config.config import RETRIEVER_K, RERANK_MODEL_NAME, RERANK_BATCH_SIZE, RERANK_CACHE_SIZE
+
+logger = get_logger(__name__)
+
+
+def load_cross_encoder(model_name=RERANK_MODEL_NAME):
+    try:
+        logger.info(f"Loading cross-encoder: {model_name}")
+        from sentence_transformers import CrossEncoder
+        model = CrossEncoder(model_name, device="cpu")
+        logger.info("Cross-encoder loaded sucesfully")
+        return model
+
+    except Exception as e:
+        error_message = CustomException("Failed to load cross-encoder", e)
+        logger.error(str(error_message))
+        raise error_message
+
+
+def pair_key(query, text):
+    payload = f"{normalize_text(query).lower()}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class ScoreCache:
+    """Thread-safe LRU of (query, chunk) -> cross-encoder score"""
+
+    def __init__(self, max_entries=RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()
+
+    def get_many(self, keys):
+        scores = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is None:
+                    self.misses += 1
+                else:
+                    self._scores.move_to_end(key)
+                    self.hits += 1
+                scores.append(score)
+        return scores
+
+    def put_many(self, keys, scores):
+        if not self.max_entries:
+            return
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.max_entries:
+                self._scores.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._scores),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CrossEncoderReranker:
+    """Scores (query, chunk) pairs with a CPU cross-encoder, one batched forward pass per call"""
+
+    def __init__(self, model=None, batch_size=RERANK_BATCH_SIZE, cache=None):
+        self.model = model if model is not None else load_cross_encoder()
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else ScoreCache()
+
+    def score(self, groups):
+        """groups: list of (query, documents); returns a list of scores per group"""
+        pairs = [(query, doc.page_content) for query, documents in groups for doc in documents]
+        keys = [pair_key(query, text) for query, text in pairs]
+        scores = self.cache.get_many(keys)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            predicted = self.model.predict([pairs[i] for i in missing], batch_size=self.batch_size, show_progress_bar=False)
+            predicted = [float(score) for score in predicted]
+            self.cache.put_many([keys[i] for i in missing], predicted)
+            for i, score in zip(missing, predicted):
+                scores[i] = score
+
+        grouped, start = [], 0
+        for _, documents in groups:
+            grouped.append(scores[start:start + len(documents)])
+            start += len(documents)
+        return grouped
+
+    def rerank(self, groups, k):
+        with metrics.timer("rerank"):
+            all_scores = self.score(groups)
+        return [
+            [doc for _, doc in sorted(zip(scores, documents), key=lambda pair: pair[0], reverse=True)[:k]]
+            for (_, documents), scores in zip(groups, all_scores)
+        ]
+
+
+class RerankingRetriever(BaseRetriever):
+    """Takes the base retriever's candidates (it should return RERANK_CANDIDATES) and keeps the k best by cross-encoder score"""
+
+    base: Any
+    reranker: Any
+    k: int = RETRIEVER_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        candidates = self.base.invoke(query, config={"callbacks": run_manager.get_child()})
+        return self.reranker.rerank([(query, candidates)], self.k)[0]
+
+    def retrieve_batch(self, queries, vectors):
+        candidates = self.base.retrieve_batch(queries, vectors)
+        # All pairs of the batch share one forward pass
+        return self.reranker.rerank(list(zip(queries, candidates)), self.k)
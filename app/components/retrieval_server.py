@@ -0,0 +1,284 @@
+"""Retrieval sidecar: one process owns the embedding model and the FAISS index and serves every worker.
+
+Start it next to the app servers, then point them at it:
+    python -m app.components.retrieval_server --address run/retrieval.sock
+    RETRIEVAL_SERVER_ADDRESS=run/retrieval.sock uvicorn app.asgi:app --workers 16
+
+A Unix socket must sit in a directory only this user can write to (it is created 0700 if
+missing), unless RETRIEVAL_SERVER_AUTHKEY is set; TCP always needs the authkey.
+
+Requests that arrive within RETRIEVAL_BATCH_WINDOW_MS of each other (up to RETRIEVAL_MAX_BATCH)
+are served together: one embedding call for all their texts and one vectorized index search.
+"""
+import argparse
+import os
+import pickle
+import queue
+import socket
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from app.components.remote_retrieval import parse_address, encode_authkey, check_socket_dir
+from app.components.retriever import search_retriever
+from app.components.vector_store import load_vector_store
+
+from app.common.logger import get_logger
+from app.common.custom_exception import CustomException
+from app.common.metrics import metrics
+
+from app.config.config import (
+    RETRIEVAL_SERVER_ADDRESS, RETRIEVAL_SERVER_AUTHKEY, RETRIEVAL_BATCH_WINDOW_MS, RETRIEVAL_MAX_BATCH,
+)
+
+logger = get_logger(__name__)
+
+# The user's private runtime directory when there is one, else run/ in the working directory
+DEFAULT_ADDRESS = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "run", "medical-rag-retrieval.sock")
+
+
+class _Reply:
+    """Sends one call's answer back on the connection it came in on"""
+
+    __slots__ = ("conn", "send_lock", "call_id")
+
+    def __init__(self, conn, send_lock, call_id):
+        self.conn = conn
+        self.send_lock = send_lock
+        self.call_id = call_id
+
+    def __call__(self, ok, value):
+        try:
+            with self.send_lock:
+                self.conn.send((self.call_id, ok, value))
+        except OSError:
+            pass  # the worker went away; nothing to answer
+
+
+def _is_text_list(value):
+    return isinstance(value, list) and all(isinstance(text, str) for text in value)
+
+
+def _check_call(op, args):
+    """Why a call can't be served, or None; checked before it can join (and fail) a batch"""
+    if op not in ("embed", "retrieve", "stats", "reload"):
+        return f"Unknown operation '{op}'"
+    if not isinstance(args, tuple):
+        return f"Arguments of '{op}' must be a tuple"
+    if op == "embed" and not (len(args) == 1 and _is_text_list(args[0])):
+        return "embed takes a list of strings"
+    if op == "retrieve":
+        if not (len(args) == 2 and _is_text_list(args[0])):
+            return "retrieve takes a list of query strings and their vectors (or None)"
+        if args[1] is not None and not (isinstance(args[1], list) and len(args[1]) == len(args[0])):
+            return "retrieve needs one vector per query"
+    if op in ("stats", "reload") and args:
+        return f"{op} takes no arguments"
+    return None
+
+
+class RetrievalServer:
+    """Serves "embed" and "retrieve" calls from many workers, in batches, against one loaded index"""
+
+    def __init__(self, address=RETRIEVAL_SERVER_ADDRESS or DEFAULT_ADDRESS, authkey=RETRIEVAL_SERVER_AUTHKEY,
+                 batch_window_ms=RETRIEVAL_BATCH_WINDOW_MS, max_batch=RETRIEVAL_MAX_BATCH):
+        self.address, self.family = parse_address(address)
+        if self.family == "AF_INET" and not authkey:
+            raise CustomException("RETRIEVAL_SERVER_AUTHKEY must be set to serve over TCP")
+        self.authkey = encode_authkey(authkey)
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self._requests = queue.Queue()
+        self._state_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._embeddings = None
+        self._retriever = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"connections": 0, "requests": 0, "batches": 0, "texts_embedded": 0, "queries_searched": 0,
+                       "largest_batch": 0, "errors": 0}
+
+    def load(self):
+        """Loads (or reloads) the index and swaps it in for the next batch"""
+        db = load_vector_store()
+        if db is None:
+            raise CustomException("Vector store not present or empty")
+        retriever = search_retriever(db)
+        with self._state_lock:
+            self._embeddings, self._retriever = db.embeddings, retriever
+        logger.info(f"Retrieval server loaded {db.index.ntotal} vectors")
+
+    def serve_forever(self):
+        self.load()
+        listener = self._listen()
+        threading.Thread(target=self._batch_loop, name="retrieval-batcher", daemon=True).start()
+        logger.info(f"Retrieval server listening on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    # Includes AuthenticationError: a client with the wrong key is turned away, not fatal
+                    logger.warning(f"Rejected retrieval client: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), name="retrieval-conn", daemon=True).start()
+        finally:
+            listener.close()
+
+    def _listen(self):
+        if self.family != "AF_UNIX":
+            return Listener(self.address, family=self.family, authkey=self.authkey)
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)), mode=0o700, exist_ok=True)
+        check_socket_dir(self.address, self.authkey)
+        self._remove_stale_socket()
+        # Bind with the socket already 0600; a chmod after bind leaves a window where anyone can connect
+        umask = os.umask(0o177)
+        try:
+            return Listener(self.address, family=self.family, authkey=self.authkey)
+        finally:
+            os.umask(umask)
+
+    def _remove_stale_socket(self):
+        if self.family != "AF_UNIX" or not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX)
+        try:
+            probe.connect(self.address)
+        except OSError:
+            os.remove(self.address)  # left behind by a server that died
+            return
+        finally:
+            probe.close()
+        raise CustomException(f"A retrieval server is already listening on {self.address}")
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+    def _serve_connection(self, conn):
+        self._count(connections=1)
+        send_lock = threading.Lock()
+        try:
+            while True:
+                data = conn.recv_bytes()
+                try:
+                    message = pickle.loads(data)
+                except Exception as e:
+                    # The whole message was read, so the connection is still in step; there is just no call id to answer
+                    logger.warning(f"Dropped an unreadable retrieval call: {e}")
+                    self._count(errors=1)
+                    continue
+                if not isinstance(message, tuple) or len(message) != 3:
+                    logger.warning(f"Dropped a malformed retrieval call: {type(message).__name__}")
+                    self._count(errors=1)
+                    continue
+                call_id, op, args = message
+                reply = _Reply(conn, send_lock, call_id)
+                problem = _check_call(op, args)
+                if problem:
+                    self._count(errors=1)
+                    reply(False, problem)
+                elif op in ("embed", "retrieve"):
+                    self._requests.put((reply, op, args))
+                elif op == "stats":
+                    reply(True, self.stats())
+                else:
+                    # Loading can take minutes; this thread must keep receiving the worker's other calls
+                    threading.Thread(target=self._reload, args=(reply,), name="retrieval-reload", daemon=True).start()
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._count(connections=-1)
+            conn.close()
+
+    def _reload(self, reply):
+        try:
+            with self._reload_lock:  # one index load at a time, however many workers ask
+                self.load()
+            reply(True, None)
+        except Exception as e:
+            error_message = CustomException("Retrieval server reload failed", e)
+            logger.error(str(error_message))
+            reply(False, str(error_message))
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                outcomes = [(True, result) for result in self._run_batch(batch)]
+            except Exception as e:
+                # Run the calls one by one, so only the call that fails gets an error
+                outcomes = [self._run_one(request) for request in batch] if len(batch) > 1 else [self._failure(e)]
+            for (reply, _, _), (ok, value) in zip(batch, outcomes):
+                reply(ok, value)
+
+    def _run_one(self, request):
+        try:
+            return True, self._run_batch([request])[0]
+        except Exception as e:
+            return self._failure(e)
+
+    def _failure(self, e):
+        error_message = CustomException("Retrieval call failed", e)
+        logger.error(str(error_message))
+        self._count(errors=1)
+        return False, str(error_message)
+
+    def _run_batch(self, batch):
+        """One embedding call for every text in the batch that needs a vector, then one search for every query"""
+        with self._state_lock:
+            embeddings, retriever = self._embeddings, self._retriever
+
+        texts = {}
+        for _, op, args in batch:
+            if op == "embed" or args[1] is None:
+                texts.update(dict.fromkeys(args[0]))  # identical texts from different workers are embedded once
+        with metrics.timer("sidecar_embedding"):
+            vectors = dict(zip(texts, embeddings.embed_documents(list(texts)))) if texts else {}
+
+        queries, query_vectors = [], []
+        for _, op, args in batch:
+            if op == "retrieve":
+                queries.extend(args[0])
+                query_vectors.extend(args[1] if args[1] is not None else [vectors[query] for query in args[0]])
+        with metrics.timer("sidecar_search"):
+            documents = retriever.retrieve_batch(queries, query_vectors) if queries else []
+
+        results, position = [], 0
+        for _, op, args in batch:
+            if op == "embed":
+                results.append([vectors[text] for text in args[0]])
+            else:
+                results.append(documents[position:position + len(args[0])])
+                position += len(args[0])
+
+        self._count(requests=len(batch), batches=1, texts_embedded=len(texts), queries_searched=len(queries))
+        with self._stats_lock:
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["mean_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["batch_window_ms"] = self.batch_window * 1000
+        stats["stages"] = metrics.snapshot()
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=RETRIEVAL_SERVER_ADDRESS or DEFAULT_ADDRESS, help="Unix socket path or host:port")
+    parser.add_argument("--batch-window-ms", type=float, default=RETRIEVAL_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=RETRIEVAL_MAX_BATCH)
+    args = parser.parse_args()
+    RetrievalServer(args.address, batch_window_ms=args.batch_window_ms, max_batch=args.max_batch).serve_forever()
@@ -1,12 +1,26 @@
+import time
+from typing import Any, List
+
+import faiss
+import numpy as np
 from langchain.chains import RetrievalQA
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
 
 from app.components.llm import load_llm
 from app.components.vector_store import load_vector_store
+from app.components.bm25_index import load_bm25_index
+from app.components.reranker import CrossEncoderReranker, RerankingRetriever
+from app.components.context_packer import ContextPacker, PackedContextRetriever
+from app.components.remote_retrieval import RemoteRetriever, get_retrieval_client
+from app.components.query_vectors import embed_query
 
-from app.config.config import HUGGINGFACE_REPO_ID,HF_TOKEN
+from app.config.config import HUGGINGFACE_REPO_ID,HF_TOKEN,RETRIEVER_K,HYBRID_SEARCH_ENABLED,HYBRID_CANDIDATES,RRF_K,RERANK_ENABLED,RERANK_CANDIDATES,CONTEXT_PACKING_ENABLED,RETRIEVAL_SERVER_ADDRESS
 from app.common.logger import get_logger
 from app.common.custom_exception import CustomException
+from app.common.metrics import metrics
 
 
 logger = get_logger(__name__)
@@ -22,18 +36,180 @@ Question:
 Answer:
 """
 
+def search_rows(vectorstore, vectors, k):
+    """One FAISS search for a whole batch of query vectors; returns the hit rows per query"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+
+    _, indices = vectorstore.index.search(vectors, k)
+    return [[int(i) for i in row if i != -1] for row in indices]
+
+
+def documents_for_rows(vectorstore, rows):
+    documents = []
+    for row in rows:
+        document = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+        if isinstance(document, Document):
+            documents.append(document)
+    return documents
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=RRF_K):
+    """Merges ranked row lists by summing 1 / (rrf_k + rank).
+
+    Equal scores go to the row with the better rank in any single list; rows that still
+    tie (each list's top hit, say) keep list order, so callers that want both need k >= 2.
+    """
+    scores, best_rank = {}, {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (rrf_k + rank)
+            best_rank[row] = min(best_rank.get(row, rank), rank)
+    return sorted(scores, key=lambda row: (-scores[row], best_rank[row]))
+
+
+class TimedVectorRetriever(BaseRetriever):
+    """FAISS retriever that records query embedding and index search as separate stages"""
+
+    vectorstore: Any
+    k: int = RETRIEVER_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        with metrics.timer("query_embedding"):
+            vector = embed_query(self.vectorstore._embed_query, query)
+        with metrics.timer("faiss_search"):
+            return self.vectorstore.similarity_search_by_vector(vector, k=self.k)
+
+    def retrieve_batch(self, queries, vectors):
+        """Documents for many already-embedded queries, from one vectorized FAISS search"""
+        return [documents_for_rows(self.vectorstore, rows) for rows in search_rows(self.vectorstore, vectors, self.k)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense FAISS hits and BM25 keyword hits fused by reciprocal rank fusion.
+
+    Both sides return `candidates` rows; BM25 postings are keyed by FAISS row, so
+    fusion is a dict merge and documents are fetched only for the final k.
+    """
+
+    vectorstore: Any
+    bm25: Any
+    k: int = RETRIEVER_K
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = RRF_K
+
+    def _fuse(self, query, dense_rows):
+        sparse_rows = [row for row, _ in self.bm25.search(query, self.candidates)]
+        return reciprocal_rank_fusion([dense_rows, sparse_rows], self.rrf_k)[:self.k]
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        with metrics.timer("query_embedding"):
+            vector = embed_query(self.vectorstore._embed_query, query)
+        with metrics.timer("faiss_search"):
+            dense_rows = search_rows(self.vectorstore, [vector], max(self.k, self.candidates))[0]
+        with metrics.timer("bm25_search"):
+            rows = self._fuse(query, dense_rows)
+        return documents_for_rows(self.vectorstore, rows)
+
+    def retrieve_batch(self, queries, vectors):
+        dense = search_rows(self.vectorstore, vectors, max(self.k, self.candidates))
+        return [documents_for_rows(self.vectorstore, self._fuse(query, rows)) for query, rows in zip(queries, dense)]
+
+
+def first_stage_retriever(db, k=RETRIEVER_K):
+    """Hybrid retriever when a BM25 index was saved with this vector store, dense-only otherwise"""
+    if HYBRID_SEARCH_ENABLED:
+        bm25 = load_bm25_index()
+        if bm25 is not None and bm25.ntotal == db.index.ntotal:
+            return HybridRetriever(vectorstore=db, bm25=bm25, k=k)
+        logger.warning("No BM25 index matches the vector store; using dense retrieval only (rebuild it with the data loader)")
+    return TimedVectorRetriever(vectorstore=db, k=k)
+
+
+def search_retriever(db, k=RETRIEVER_K):
+    """First-stage retriever, wrapped in a cross-encoder rerank over RERANK_CANDIDATES when RERANK_ENABLED"""
+    if RERANK_ENABLED:
+        try:
+            reranker = CrossEncoderReranker()
+            return RerankingRetriever(base=first_stage_retriever(db, k=max(k, RERANK_CANDIDATES)), reranker=reranker, k=k)
+        except Exception as e:
+            logger.warning(f"Reranking disabled, cross-encoder unavailable: {e}")
+    return first_stage_retriever(db, k=k)
+
+
+def create_retriever(db, k=RETRIEVER_K):
+    """search_retriever(), or the retrieval sidecar's when RETRIEVAL_SERVER_ADDRESS is set,
+    wrapped in the context token budget when CONTEXT_PACKING_ENABLED"""
+    if RETRIEVAL_SERVER_ADDRESS:
+        retriever = RemoteRetriever(client=get_retrieval_client())
+    else:
+        retriever = search_retriever(db, k=k)
+
+    if CONTEXT_PACKING_ENABLED:
+        retriever = PackedContextRetriever(base=retriever, packer=ContextPacker(prompt_template=CUSTOM_PROMPT_TEMPLATE))
+    return retriever
+
+
+def retriever_component(retriever, name):
+    """Attribute `name` of the retriever or of the first retriever it wraps (through `.base`) that has one"""
+    while retriever is not None:
+        value = getattr(retriever, name, None)
+        if value is not None:
+            return value
+        retriever = getattr(retriever, "base", None)
+    return None
+
+
+class StageTimingHandler(BaseCallbackHandler):
+    """Per-request callback that times prompt assembly, LLM time-to-first-token and generation"""
+
+    run_inline = True
+
+    def __init__(self):
+        self.retrieved_at = None
+        self.llm_started_at = None
+        self.first_token_at = None
+
+    def on_retriever_end(self, documents, **kwargs):
+        self.retrieved_at = time.perf_counter()
+
+    def _on_llm_start(self):
+        self.llm_started_at = time.perf_counter()
+        if self.retrieved_at is not None:
+            metrics.observe("prompt_assembly", self.llm_started_at - self.retrieved_at)
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._on_llm_start()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._on_llm_start()
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_at is None and self.llm_started_at is not None:
+            self.first_token_at = time.perf_counter()
+            metrics.observe("llm_ttft", self.first_token_at - self.llm_started_at)
+
+    def on_llm_end(self, response, **kwargs):
+        if self.llm_started_at is not None:
+            metrics.observe("llm_generation", time.perf_counter() - self.llm_started_at)
+
+
 def set_custom_prompt():
     return PromptTemplate(template=CUSTOM_PROMPT_TEMPLATE,input_variables=["context" , "question"])
 
-def create_qa_chain():
+def create_qa_chain(db=None, llm=None):
     try:
-        logger.info("Loading vector store for context")
-        db = load_vector_store()
+        # With a retrieval sidecar the index lives there; this process never loads it
+        if db is None and not RETRIEVAL_SERVER_ADDRESS:
+            logger.info("Loading vector store for context")
+            db = load_vector_store()
 
-        if db is None:
-            raise CustomException("Vector store not present or empty")
+            if db is None:
+                raise CustomException("Vector store not present or empty")
 
-        llm = load_llm(huggingface_repo_id=HUGGINGFACE_REPO_ID , hf_token=HF_TOKEN )
+        if llm is None:
+            llm = load_llm(huggingface_repo_id=HUGGINGFACE_REPO_ID , hf_token=HF_TOKEN )
 
         if llm is None:
             raise CustomException("LLM not loaded")
@@ -41,7 +217,7 @@ def create_qa_chain():
         qa_chain = RetrievalQA.from_chain_type(
             llm=llm,
             chain_type="stuff",
-            retriever = db.as_retriever(search_kwargs={'k':1}),
+            retriever = create_retriever(db),
             return_source_documents=False,
             chain_type_kwargs={'prompt': set_custom_prompt()}
         )
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import Future, CancelledError
+
+
+class SingleFlight:
+    """At most one in-flight computation per key; concurrent callers with the same key share its outcome.
+
+    Threads and asyncio tasks share the same calls, so a question asked through the
+    sync and async paths at once still runs once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def attach(self, key, factory):
+        """(call, leader): the call in flight for `key`, or a new one from `factory()` that the caller must run and forget()"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = factory()
+            self.leaders += 1
+            return call, True
+
+    def forget(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def do(self, key, fn):
+        """fn()'s result, computed once for all concurrent callers with `key`; returns (result, coalesced)"""
+        while True:
+            future, leader = self.attach(key, Future)
+            if not leader:
+                try:
+                    return future.result(), True
+                except CancelledError:
+                    continue  # the leader was an async request that got cancelled; take over
+            try:
+                result = fn()
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self.forget(key, future)
+
+    async def ado(self, key, coro_fn):
+        """Async do(): awaits `coro_fn()` once for all concurrent callers with `key`; returns (result, coalesced)"""
+        while True:
+            future, leader = self.attach(key, Future)
+            if not leader:
+                try:
+                    # Shielded so a follower being cancelled doesn't cancel the shared call
+                    return await asyncio.shield(asyncio.wrap_future(future)), True
+                except asyncio.CancelledError:
+                    if future.cancelled():
+                        continue  # the leader was cancelled, not us
+                    raise
+            try:
+                result = await coro_fn()
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self.forget(key, future)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
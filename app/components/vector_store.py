@@ -1,13 +1,21 @@
 from langchain_community.vectorstores import FAISS
 import os
 # Removed streamlit import to prevent CacheReplayClosureError
-from app.components.embeddings import get_embedding_model
-from app.components.pdf_loader import load_pdf_files, create_text_chunks
+from app.components.embeddings import get_embedding_model, embedding_model_id
+from app.components.mmap_store import save_faiss_store, export_mmap_store, has_mmap_store, load_mmap_vector_store
+from app.components.bm25_index import export_bm25_index, has_bm25_index
+from app.components.ann_index import apply_search_params, supports_removal, index_type_of
+from app.components.ingestion import IngestionPipeline, IngestionCheckpoint, plan_signature
+from app.components.pdf_loader import list_data_files, iter_documents, iter_text_chunks
+from app.components.index_manifest import (
+    load_manifest, save_manifest, new_manifest, diff_manifest,
+    manifest_path, file_sha256, file_key, chunk_id, chunk_ids,
+)
 
 from app.common.logger import get_logger
 from app.common.custom_exception import CustomException
 
-from app.config.config import DB_FAISS_PATH
+from app.config.config import DB_FAISS_PATH, EMBEDDING_MODEL_NAME, EMBED_BATCH_SIZE, EMBED_WORKERS, EMBED_POOL, VECTOR_STORE_MMAP, VECTOR_INDEX_TYPE
 
 logger = get_logger(__name__)
 
@@ -16,40 +24,48 @@ def regenerate_vector_store():
     try:
         logger.info("⚠️ Attempting to regenerate vector store from source PDFs...")
         # REMOVED st.toast to prevent Streamlit Caching errors
-        
-        # 1. Load Documents
-        documents = load_pdf_files()
-        if not documents:
-            logger.error("No documents found to regenerate vector store.")
-            return None
-            
-        # 2. Chunk Text
-        text_chunks = create_text_chunks(documents)
-        if not text_chunks:
-            logger.error("No text chunks created.")
-            return None
-            
-        # 3. Save & Return
-        return save_vector_store(text_chunks)
+        return update_vector_store(full_rebuild=True)
         
     except Exception as e:
         logger.error(f"Failed to regenerate vector store: {e}")
         return None
 
+def stored_embedding_model():
+    """Embedding model id recorded for the saved store, or None when it has no manifest"""
+    manifest = load_manifest()
+    return manifest.get("embedding_model", EMBEDDING_MODEL_NAME) if manifest is not None else None
+
 def load_vector_store():
     try:
+        # Query vectors from a different model would search the stored ones without any error
+        stored_model = stored_embedding_model()
+        if stored_model is not None and stored_model != embedding_model_id():
+            logger.warning(f"Vectorstore was built with {stored_model} but {embedding_model_id()} is configured, rebuilding")
+            return regenerate_vector_store()
+
         embedding_model = get_embedding_model()
 
+        if VECTOR_STORE_MMAP and has_mmap_store():
+            logger.info("Loading memory-mapped vectorstore...")
+            try:
+                db = load_mmap_vector_store(embedding_model)
+                apply_search_params(db.index)
+                return db
+            except Exception as e:
+                logger.warning(f"Memory-mapped load failed, falling back to pickle: {e}")
+
         # Check if vector store exists
         if os.path.exists(DB_FAISS_PATH):
             logger.info("Loading existing vectorstore...")
             try:
                 # Attempt to load
-                return FAISS.load_local(
+                db = FAISS.load_local(
                     DB_FAISS_PATH,
                     embedding_model,
                     allow_dangerous_deserialization=True
                 )
+                apply_search_params(db.index)
+                return db
             except Exception as e:
                 # If loading fails (e.g. Pydantic/Pickle mismatch), regenerate!
                 logger.error(f"❌ Corrupt/Incompatible Vector Store found: {e}")
@@ -65,6 +81,17 @@ def load_vector_store():
         logger.error(str(error_message))
         return None
 
+def build_vector_store(text_chunks, embedding_model, ids=None, db=None, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS, pool=EMBED_POOL):
+    """Embeds chunks in batches across a worker pool and appends each batch to FAISS as it arrives.
+
+    Without db a new VECTOR_INDEX_TYPE index is created; index types that need
+    training hold batches back until enough vectors have arrived to train on.
+    """
+    logger.info(f"Embedding {len(text_chunks)} chunks in batches of {batch_size} using {workers} {pool} workers")
+
+    pipeline = IngestionPipeline(embedding_model, db=db, n_vectors=len(text_chunks), batch_size=batch_size, workers=workers, pool=pool)
+    return pipeline.run(zip(text_chunks, ids or [None] * len(text_chunks)))
+
 # Creating new vectorstore function
 def save_vector_store(text_chunks):
     try:
@@ -75,11 +102,17 @@ def save_vector_store(text_chunks):
 
         embedding_model = get_embedding_model()
 
-        db = FAISS.from_documents(text_chunks,embedding_model)
+        db = build_vector_store(text_chunks, embedding_model)
 
         logger.info("Saving vectorstore...")
 
-        db.save_local(DB_FAISS_PATH)
+        save_faiss_store(db)
+        export_mmap_store(db)
+        export_bm25_index(db)
+
+        # Chunks saved without per-file IDs can't be tracked incrementally
+        if os.path.exists(manifest_path()):
+            os.remove(manifest_path())
 
         logger.info("Vectorstore saved successfully!")
 
@@ -89,3 +122,138 @@ def save_vector_store(text_chunks):
         error_message = CustomException("Failed to create new vectorstore", e)
         logger.error(str(error_message))
         return None
+
+def update_vector_store(full_rebuild=False):
+    """Re-embeds only new/changed files in DATA_PATH and drops vectors of removed ones"""
+    try:
+        current_files = {file_key(path): path for path in list_data_files()}
+        current_hashes = {key: file_sha256(path) for key, path in current_files.items()}
+
+        manifest = None if full_rebuild else load_manifest()
+        embedding_model = get_embedding_model()
+
+        db = None
+        if manifest is not None and os.path.exists(DB_FAISS_PATH):
+            try:
+                db = FAISS.load_local(DB_FAISS_PATH, embedding_model, allow_dangerous_deserialization=True)
+            except Exception as e:
+                logger.warning(f"Existing vectorstore unreadable, rebuilding from scratch: {e}")
+                manifest = None
+
+        # index_type is what was built; a small corpus can get a flat index when PQ was requested
+        requested = manifest.get("requested_index_type", manifest.get("index_type", "flat")) if manifest is not None else None
+        if manifest is not None and requested != VECTOR_INDEX_TYPE:
+            logger.info(f"Index type changed from {requested} to {VECTOR_INDEX_TYPE}, rebuilding")
+            manifest, db = None, None
+
+        if manifest is not None and manifest.get("embedding_model", EMBEDDING_MODEL_NAME) != embedding_model_id():
+            logger.info(f"Embedding model changed from {manifest.get('embedding_model', EMBEDDING_MODEL_NAME)} to {embedding_model_id()}, rebuilding")
+            manifest, db = None, None
+
+        if manifest is None:
+            logger.info("Building vectorstore from scratch")
+            manifest = new_manifest()
+
+        to_embed, to_remove, unchanged = diff_manifest(manifest, current_hashes)
+        logger.info(f"Vectorstore update: {len(to_embed)} to embed, {len(to_remove)} to remove, {len(unchanged)} unchanged")
+
+        if (to_embed or to_remove) and manifest.get("index_type", VECTOR_INDEX_TYPE) != VECTOR_INDEX_TYPE:
+            # The corpus was too small for the requested type last time; now that it changed, try again
+            logger.info(f"Store holds a {manifest['index_type']} fallback for {VECTOR_INDEX_TYPE}, rebuilding")
+            return update_vector_store(full_rebuild=True)
+
+        if not to_embed and not to_remove and db is not None:
+            logger.info("Vectorstore is up to date")
+            if not has_mmap_store():
+                export_mmap_store(db)
+            if not has_bm25_index():
+                export_bm25_index(db)
+            return db
+
+        # Identifies this exact update so an interrupted run can resume from its checkpoint
+        checkpoint = IngestionCheckpoint(plan_signature({
+            "base": sorted((key, entry["sha256"]) for key, entry in manifest["files"].items()),
+            "embed": [(key, current_hashes[key]) for key in to_embed],
+            "remove": to_remove,
+            "index_type": VECTOR_INDEX_TYPE,
+            "embedding_model": embedding_model_id(),
+        }))
+
+        skip = 0
+        resumed = checkpoint.load(embedding_model)
+        if resumed is not None:
+            # Stale vectors were already removed before the checkpoint was taken
+            db, skip = resumed
+        elif db is not None and to_remove:
+            stale_ids = []
+            for key in to_remove:
+                stale_ids.extend(chunk_ids(key, manifest["files"][key]["chunks"]))
+            if stale_ids and not supports_removal(db.index):
+                logger.info(f"{type(db.index).__name__} can't remove vectors in place, rebuilding from scratch")
+                return update_vector_store(full_rebuild=True)
+            if stale_ids:
+                db.delete(stale_ids)
+            logger.info(f"Removed {len(stale_ids)} stale vectors")
+
+        # Changed files whose stored vectors a failed load must not be allowed to replace
+        replaced = {key for key in to_embed if manifest["files"].get(key, {}).get("sha256")} if db is not None else set()
+
+        for key in to_remove:
+            manifest["files"].pop(key, None)
+
+        keys_by_path = {current_files[key]: key for key in to_embed}
+        chunk_counts = {key: 0 for key in to_embed}
+        failed = set()
+
+        def planned_chunks():
+            for chunk in iter_text_chunks(iter_documents(list(keys_by_path), failed=failed)):
+                key = keys_by_path[chunk.metadata["source"]]
+                yield chunk, chunk_id(key, chunk_counts[key])
+                chunk_counts[key] += 1
+
+        if to_embed:
+            # Appending (rather than merging a second index) keeps trained IVF/PQ codebooks and HNSW graphs valid
+            pipeline = IngestionPipeline(embedding_model, db=db, checkpoint=checkpoint)
+            db = pipeline.run(planned_chunks(), skip=skip)
+
+        failed_keys = {keys_by_path[path] for path in failed}
+        if failed_keys & replaced:
+            # Nothing is saved, so the files keep their old vectors and manifest entries and are retried next run.
+            # The checkpoint goes too: it holds a partial load that a retry would misalign with.
+            checkpoint.clear()
+            raise CustomException(f"Failed to load {', '.join(sorted(failed_keys))}; vectorstore left unchanged")
+        if failed_keys:
+            logger.error(f"Skipped unreadable files, will retry them next run: {', '.join(sorted(failed_keys))}")
+
+        if db is not None and skip == 0 and not to_remove and not any(chunk_counts.values()):
+            # Only unreadable files to add: the saved store is already current
+            checkpoint.clear()
+            return db
+
+        for key in to_embed:
+            if key not in failed_keys:
+                manifest["files"][key] = {"sha256": current_hashes[key], "chunks": chunk_counts[key]}
+            elif chunk_counts[key]:
+                # Partly loaded: no hash, so the next run removes these chunks and loads the file again
+                manifest["files"][key] = {"sha256": None, "chunks": chunk_counts[key]}
+
+        if db is None:
+            logger.error("No documents found to build the vector store.")
+            return None
+
+        manifest["index_type"] = index_type_of(db.index)
+        manifest["requested_index_type"] = VECTOR_INDEX_TYPE
+        manifest["embedding_model"] = embedding_model_id()
+        save_faiss_store(db)
+        export_mmap_store(db)
+        export_bm25_index(db)
+        save_manifest(manifest)
+        checkpoint.clear()
+
+        logger.info(f"Vectorstore updated: {db.index.ntotal} vectors across {len(manifest['files'])} files")
+        return db
+
+    except Exception as e:
+        error_message = CustomException("Failed to update vectorstore", e)
+        logger.error(str(error_message))
+        return None
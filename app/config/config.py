@@ -1,18 +1,160 @@
 import os
-import streamlit as st
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def _streamlit_secret(name):
+    """Reads a Streamlit secret only inside a running Streamlit app; other processes never import streamlit"""
+    if "streamlit" not in sys.modules:
+        return None
+    try:
+        import streamlit as st
+        from streamlit.runtime import exists
+        if exists() and name in st.secrets:
+            return st.secrets[name]
+    except Exception:
+        pass
+    return None
+
 # Try to load from Streamlit secrets first, then environment variables
-if "HF_TOKEN" in st.secrets:
-    HF_TOKEN = st.secrets["HF_TOKEN"]
-else:
-    HF_TOKEN = os.environ.get("HF_TOKEN")
+HF_TOKEN = _streamlit_secret("HF_TOKEN") or os.environ.get("HF_TOKEN")
 
 HUGGINGFACE_REPO_ID="meta-llama/Meta-Llama-3-8B-Instruct"
+# OpenAI-compatible endpoint serving HUGGINGFACE_REPO_ID (point at a local stub for benchmarks)
+LLM_API_BASE = os.environ.get("LLM_API_BASE", "https://router.huggingface.co/v1")
+
+# Shared HTTP client for the LLM endpoint (HTTP/2 needs the `h2` package)
+LLM_POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 60))
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "false").lower() == "true"
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BACKOFF = float(os.environ.get("LLM_RETRY_BACKOFF", 0.5))
+LLM_RETRY_BACKOFF_MAX = float(os.environ.get("LLM_RETRY_BACKOFF_MAX", 8))
+
+EMBEDDING_MODEL_NAME="sentence-transformers/all-MiniLM-L6-v2"
+# "huggingface" (PyTorch) or "onnx" (EMBEDDING_MODEL_NAME exported to ONNX_MODEL_PATH)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "huggingface")
+ONNX_MODEL_PATH = os.environ.get("ONNX_MODEL_PATH", "models/all-MiniLM-L6-v2-onnx")
+ONNX_QUANTIZED = os.environ.get("ONNX_QUANTIZED", "true").lower() == "true"  # int8 weights
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", 0))  # 0 lets onnxruntime decide
+EMBEDDING_MAX_LENGTH = int(os.environ.get("EMBEDDING_MAX_LENGTH", 256))  # all-MiniLM-L6-v2's max_seq_length
 
-DB_FAISS_PATH="vectorstore/db_faiss"
-DATA_PATH="data/"
+DB_FAISS_PATH = os.environ.get("DB_FAISS_PATH", "vectorstore/db_faiss")
+DATA_PATH = os.environ.get("DATA_PATH", "data/")
 CHUNK_SIZE=500
 CHUNK_OVERLAP=50
+# With hybrid search the top dense and top keyword hits tie under RRF; set 2 or more to keep both
+RETRIEVER_K = int(os.environ.get("RETRIEVER_K", 1))
+
+# Document loading: PDF pages are parsed in page ranges across a process pool
+LOADER_WORKERS = int(os.environ.get("LOADER_WORKERS", os.cpu_count() or 1))
+LOADER_PAGES_PER_TASK = int(os.environ.get("LOADER_PAGES_PER_TASK", 16))
+
+# QA engine (shared chain per process)
+QA_ENGINE_WARMUP = os.environ.get("QA_ENGINE_WARMUP", "true").lower() == "true"
+RELOAD_TOKEN = os.environ.get("RELOAD_TOKEN")
+
+# Vector store build pipeline
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 64))
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", os.cpu_count() or 1))
+EMBED_POOL = os.environ.get("EMBED_POOL", "thread")  # "thread" or "process"
+# Batches buffered between ingestion stages, and how often (in chunks) to checkpoint
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 8))
+INGEST_CHECKPOINT_EVERY = int(os.environ.get("INGEST_CHECKPOINT_EVERY", 5000))
+INGEST_CHECKPOINT_PATH = DB_FAISS_PATH + "_checkpoint"
+# Vectors buffered to train IVF/PQ indexes (raised to what k-means needs); nothing is indexed or checkpointed before that
+INGEST_TRAIN_SAMPLE = int(os.environ.get("INGEST_TRAIN_SAMPLE", 16384))
+
+# Persistent embedding cache (model + normalized text hash -> vector)
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "vectorstore/embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", 100000))
+
+# Answer cache in front of the QA chain
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1000))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600))
+# Cosine similarity for serving a cached answer to a near-duplicate question; 0 (the default) disables it,
+# since paraphrases can differ in a way that matters medically ("... while pregnant" / "... while breastfeeding")
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0))
+
+# Hybrid retrieval: BM25 keyword hits fused with dense hits by reciprocal rank fusion
+HYBRID_SEARCH_ENABLED = os.environ.get("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 20))  # hits taken from each side before fusing
+RRF_K = int(os.environ.get("RRF_K", 60))
+BM25_K1 = float(os.environ.get("BM25_K1", 1.5))
+BM25_B = float(os.environ.get("BM25_B", 0.75))
+
+# Optional cross-encoder rerank: fetch RERANK_CANDIDATES, keep the RETRIEVER_K best
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_NAME = os.environ.get("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 20))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", 32))
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", 10000))
+
+# Context packing for the "stuff" prompt: retrieved chunks are deduplicated and added by relevance
+# until CONTEXT_TOKEN_BUDGET tokens; CONTEXT_TOKENIZER is a tiktoken encoding or a tokenizer.json path
+CONTEXT_PACKING_ENABLED = os.environ.get("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+CONTEXT_TOKENIZER = os.environ.get("CONTEXT_TOKENIZER", "cl100k_base")
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 1500))
+# Share of a chunk's word 3-grams found in an already packed chunk that makes it a near-duplicate
+CONTEXT_DEDUP_THRESHOLD = float(os.environ.get("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+# Retrieval sidecar (python -m app.components.retrieval_server): one process owns the embedding model and
+# index and serves every worker. RETRIEVAL_SERVER_ADDRESS is a Unix socket path or host:port; unset loads them per process
+RETRIEVAL_SERVER_ADDRESS = os.environ.get("RETRIEVAL_SERVER_ADDRESS")
+RETRIEVAL_SERVER_AUTHKEY = os.environ.get("RETRIEVAL_SERVER_AUTHKEY")  # required for host:port or a socket in a shared directory
+# Requests arriving within RETRIEVAL_BATCH_WINDOW_MS of each other share one embedding call and one index search
+RETRIEVAL_BATCH_WINDOW_MS = float(os.environ.get("RETRIEVAL_BATCH_WINDOW_MS", 5))
+RETRIEVAL_MAX_BATCH = int(os.environ.get("RETRIEVAL_MAX_BATCH", 64))
+# Seconds a worker waits for the sidecar to come up, for each call, and for an index reload (which may rebuild)
+RETRIEVAL_CONNECT_TIMEOUT = float(os.environ.get("RETRIEVAL_CONNECT_TIMEOUT", 60))
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", 30))
+RETRIEVAL_RELOAD_TIMEOUT = float(os.environ.get("RETRIEVAL_RELOAD_TIMEOUT", 600))
+
+# Batch question API: max questions per request and concurrent LLM calls per batch
+BATCH_MAX_QUESTIONS = int(os.environ.get("BATCH_MAX_QUESTIONS", 500))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", 8))
+
+# Chat history kept server-side per browser session: "memory" (per process) or "sqlite" (shared file)
+CONVERSATION_STORE = os.environ.get("CONVERSATION_STORE", "memory")
+CONVERSATION_DB_PATH = os.environ.get("CONVERSATION_DB_PATH", "vectorstore/conversations.sqlite3")
+CONVERSATION_MAX_CONVERSATIONS = int(os.environ.get("CONVERSATION_MAX_CONVERSATIONS", 10000))
+CONVERSATION_MAX_MESSAGES = int(os.environ.get("CONVERSATION_MAX_MESSAGES", 1000))
+CONVERSATION_PAGE_SIZE = int(os.environ.get("CONVERSATION_PAGE_SIZE", 50))
+# Signs the session cookie; every worker process must share it or sessions break across workers
+FLASK_SECRET_KEY = os.environ.get("FLASK_SECRET_KEY")
+
+# Async (ASGI) serving
+ASGI_MAX_CONCURRENCY = int(os.environ.get("ASGI_MAX_CONCURRENCY", 64))
+# Requests allowed to wait for a slot before new ones get 503; 0 means unbounded
+ASGI_MAX_QUEUE = int(os.environ.get("ASGI_MAX_QUEUE", 256))
+
+# Serve the index memory-mapped with a non-pickle docstore when available
+VECTOR_STORE_MMAP = os.environ.get("VECTOR_STORE_MMAP", "true").lower() == "true"
+
+# ANN index type for new vector stores: flat (exact), ivf, hnsw, pq or ivfpq
+VECTOR_INDEX_TYPE = os.environ.get("VECTOR_INDEX_TYPE", "flat")
+IVF_NLIST = int(os.environ.get("IVF_NLIST", 256))
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", 16))
+HNSW_M = int(os.environ.get("HNSW_M", 32))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.environ.get("HNSW_EF_SEARCH", 64))
+PQ_M = int(os.environ.get("PQ_M", 16))
+PQ_NBITS = int(os.environ.get("PQ_NBITS", 8))
+
+# Samples kept per stage for the rolling latency histograms
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", 1000))
+
+# Logging: with LOG_ASYNC request threads only enqueue and a background thread writes records in batches;
+# records arriving while LOG_QUEUE_SIZE are waiting get dropped (and counted) rather than block
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", 256))
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # "text" or "json" (JSON lines with request_id and stage timings)
+# Daily log files roll over to log_<date>.<n>.log at LOG_MAX_BYTES (0 disables); 0 days keeps all files
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 50 * 1024 * 1024))
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", 30))
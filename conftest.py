@@ -0,0 +1,2 @@
+# medical-rag-chatbot/ is a separate project with its own `app` package; run its tests from inside it
+collect_ignore = ["medical-rag-chatbot"]
@@ -1,8 +1,11 @@
 from flask import Flask, request, jsonify
-from retriever.retriever import get_answer
+from retriever.retriever import get_answer, get_answers
 
 app = Flask(__name__)
 
+MAX_BATCH_QUESTIONS = 500
+BATCH_WORKERS = 8
+
 @app.route("/query", methods=["POST"])
 def query():
     data = request.json
@@ -12,5 +15,15 @@ def query():
     answer = get_answer(question)
     return jsonify({"answer": answer})
 
+@app.route("/query/batch", methods=["POST"])
+def query_batch():
+    data = request.json
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_QUESTIONS} questions per batch"}), 413
+    return jsonify({"results": get_answers(questions, max_workers=BATCH_WORKERS)})
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080)
@@ -1,5 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from llm.llm_setup import load_llm
 
-def get_answer(question):
-    llm = load_llm()
+def get_answer(question, llm=None):
+    llm = llm or load_llm()
     return llm(question)
+
+def get_answers(questions, max_workers=8):
+    """Answers questions concurrently with one shared LLM client; results keep input order"""
+    llm = load_llm()
+
+    def answer(question):
+        if not isinstance(question, str) or not question.strip():
+            return {"question": question, "error": "Question must be a non-empty string"}
+        try:
+            return {"question": question, "answer": get_answer(question, llm)}
+        except Exception as e:
+            return {"question": question, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(answer, questions))
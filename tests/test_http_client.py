@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.components import http_client
+from app.components.http_client import RetryTransport, backoff_delay, get_async_http_client, get_http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-ish stub: /ok answers, /flaky/<n> fails n times with 503, /slow-down sends 429 + Retry-After once"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections are reused
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+        if self.path.startswith("/flaky/") and hits <= int(self.path.rsplit("/", 1)[1]):
+            self._reply(503, {"Retry-After": "0"})
+        elif self.path == "/slow-down" and hits == 1:
+            self._reply(429, {"Retry-After": "0.3"})
+        else:
+            self._reply(200)
+
+    def _reply(self, status, headers=None):
+        body = b'{"ok": true}' if status == 200 else b'{"error": "busy"}'
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.hits = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_client_reuses_one_connection(stub_server):
+    _, base = stub_server
+    client = get_http_client()
+    before = http_client.http_stats()
+    for _ in range(5):
+        assert client.get(f"{base}/ok").status_code == 200
+    after = http_client.http_stats()
+    assert after["requests"] - before["requests"] == 5
+    assert after["new_connections"] - before["new_connections"] == 1
+
+
+def test_retries_5xx_until_success(stub_server):
+    server, base = stub_server
+    client = httpx.Client(transport=RetryTransport(httpx.HTTPTransport(), max_retries=3))
+    before = http_client.http_stats()
+    assert client.get(f"{base}/flaky/2").status_code == 200
+    assert server.hits["/flaky/2"] == 3
+    assert http_client.http_stats()["retries"] - before["retries"] == 2
+
+
+def test_gives_up_after_max_retries(stub_server):
+    server, base = stub_server
+    client = httpx.Client(transport=RetryTransport(httpx.HTTPTransport(), max_retries=1))
+    assert client.get(f"{base}/flaky/5").status_code == 503
+    assert server.hits["/flaky/5"] == 2
+
+
+def test_honours_retry_after(stub_server):
+    server, base = stub_server
+    client = httpx.Client(transport=RetryTransport(httpx.HTTPTransport(), max_retries=2))
+    started = time.monotonic()
+    assert client.get(f"{base}/slow-down").status_code == 200
+    assert time.monotonic() - started >= 0.3
+    assert server.hits["/slow-down"] == 2
+
+
+def test_retry_after_is_capped():
+    response = httpx.Response(429, headers={"Retry-After": "120"})
+    assert backoff_delay(0, response, cap=8) == 8
+    assert 0 <= backoff_delay(3, httpx.Response(503), base=0.5, cap=8) <= 4
+
+
+def test_async_client_works_across_event_loops(stub_server):
+    _, base = stub_server
+    client = get_async_http_client()
+
+    async def fetch():
+        responses = await asyncio.gather(*(client.get(f"{base}/ok") for _ in range(3)))
+        return [response.status_code for response in responses]
+
+    # Each asyncio.run is a new loop; a pool bound to the first one would fail on the second
+    assert asyncio.run(fetch()) == [200, 200, 200]
+    assert asyncio.run(fetch()) == [200, 200, 200]
@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from multiprocessing.connection import Listener
+
+from app.components.remote_retrieval import RemoteEmbeddings, RemoteRetriever, RetrievalClient
+
+AUTHKEY = "test-key"
+
+
+def serve(listener):
+    """Stub sidecar: answers embed/retrieve calls at once, one thread per connection"""
+
+    def handle(conn):
+        try:
+            while True:
+                call_id, op, args = conn.recv()
+                if op == "embed":
+                    conn.send((call_id, True, [[float(len(text))] for text in args[0]]))
+                elif op == "retrieve":
+                    conn.send((call_id, True, [[Document(page_content=f"about {query}")] for query in args[0]]))
+                else:
+                    conn.send((call_id, False, f"Unknown operation '{op}'"))
+        except (EOFError, OSError):
+            conn.close()
+
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            return
+        threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    address = str(tmp_path / "retrieval.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=AUTHKEY.encode())
+    threading.Thread(target=serve, args=(listener,), daemon=True).start()
+    yield address
+    listener.close()
+
+
+def ask_in_child(retriever, embeddings, results):
+    try:
+        documents = retriever.invoke("fever")
+        results.put((documents[0].page_content, embeddings.embed_query("cough"), os.getpid()))
+    except Exception as e:
+        results.put(repr(e))
+
+
+def test_forked_worker_reuses_engine_objects(sidecar):
+    # Built and used before the fork, as the engine's chain is when workers are forked after warm-up
+    client = RetrievalClient(sidecar, authkey=AUTHKEY, connect_timeout=5, timeout=5)
+    retriever, embeddings = RemoteRetriever(client=client), RemoteEmbeddings(client)
+    assert retriever.invoke("fever")[0].page_content == "about fever"
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=ask_in_child, args=(retriever, embeddings, results))
+    child.start()
+    outcome = results.get(timeout=10)
+    child.join(10)
+
+    assert outcome[:2] == ("about fever", [5.0]), outcome
+    assert outcome[2] != os.getpid()
+    # The parent's connection is untouched by the child closing its copy
+    assert retriever.invoke("asthma")[0].page_content == "about asthma"
+    assert client.reconnects == 0
+
+
+def test_client_reconnects_after_close(sidecar):
+    client = RetrievalClient(sidecar, authkey=AUTHKEY, connect_timeout=5, timeout=5)
+    assert client.embed(["a"]) == [[1.0]]
+    client.close()
+    assert client.retrieve(["fever"])[0][0].page_content == "about fever"
+    assert client.reconnects == 1
@@ -0,0 +1,76 @@
+import threading
+from multiprocessing import Pipe
+
+import pytest
+from langchain_core.documents import Document
+
+from app.components.retrieval_server import RetrievalServer
+
+
+class StubEmbeddings:
+    def embed_documents(self, texts):
+        if any("boom" in text for text in texts):
+            raise ValueError("cannot embed")
+        return [[float(len(text))] for text in texts]
+
+
+class StubRetriever:
+    def retrieve_batch(self, queries, vectors):
+        return [[Document(page_content=f"about {query}")] for query in queries]
+
+
+@pytest.fixture
+def connection():
+    server = RetrievalServer("unused.sock", batch_window_ms=50)
+    server._embeddings, server._retriever = StubEmbeddings(), StubRetriever()
+    threading.Thread(target=server._batch_loop, daemon=True).start()
+    client_end, server_end = Pipe()
+    threading.Thread(target=server._serve_connection, args=(server_end,), daemon=True).start()
+    yield client_end
+    client_end.close()
+
+
+def reply(conn):
+    assert conn.poll(5), "no reply"
+    return conn.recv()
+
+
+def test_serves_embed_and_retrieve(connection):
+    connection.send((1, "embed", (["ab"],)))
+    assert reply(connection) == (1, True, [[2.0]])
+    connection.send((2, "retrieve", (["fever"], None)))
+    call_id, ok, documents = reply(connection)
+    assert (call_id, ok, documents[0][0].page_content) == (2, True, "about fever")
+
+
+@pytest.mark.parametrize("op, args", [
+    ("delete", ()),
+    ("embed", "not a tuple"),
+    ("embed", ("not a list",)),
+    ("retrieve", (["fever"],)),
+    ("retrieve", (["fever", "cough"], [[1.0]])),
+    ("stats", (1,)),
+])
+def test_bad_call_gets_an_error_reply_and_keeps_the_connection(connection, op, args):
+    connection.send((7, op, args))
+    call_id, ok, error = reply(connection)
+    assert (call_id, ok) == (7, False) and error
+    connection.send((8, "embed", (["abc"],)))
+    assert reply(connection) == (8, True, [[3.0]])
+
+
+def test_unreadable_messages_are_dropped_without_closing_the_connection(connection):
+    connection.send_bytes(b"not a pickle")
+    connection.send(("wrong", "shape"))
+    connection.send((9, "embed", (["a"],)))
+    assert reply(connection) == (9, True, [[1.0]])
+
+
+def test_a_failing_call_only_fails_itself(connection):
+    # Sent together, so they land in one batch
+    for call_id, text in enumerate(["one", "boom", "three"]):
+        connection.send((call_id, "embed", ([text],)))
+    replies = sorted(reply(connection) for _ in range(3))
+    assert replies[0] == (0, True, [[3.0]])
+    assert replies[1][:2] == (1, False) and "cannot embed" in replies[1][2]
+    assert replies[2] == (2, True, [[5.0]])
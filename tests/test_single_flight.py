@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.components.single_flight import SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        time.sleep(0.005)
+
+
+async def async_wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        await asyncio.sleep(0.005)
+
+
+def test_concurrent_threads_share_one_call():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "key", compute) for _ in range(8)]
+        wait_until(lambda: flight.stats()["coalesced"] == 7)
+        release.set()
+        outcomes = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert sorted(coalesced for _, coalesced in outcomes) == [False] + [True] * 7
+    assert all(result == "answer" for result, _ in outcomes)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 7}
+
+
+def test_followers_see_the_leaders_exception():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("llm down")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "key", fail) for _ in range(3)]
+        wait_until(lambda: flight.stats()["coalesced"] == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="llm down"):
+                future.result()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flight, calls = SingleFlight(), []
+    compute = lambda: calls.append(1) or len(calls)
+    assert flight.do("a", compute) == (1, False)
+    assert flight.do("b", compute) == (2, False)
+    assert flight.do("a", compute) == (3, False)  # the first "a" call finished, so nothing to join
+
+
+def test_concurrent_tasks_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("key", compute) for _ in range(5)))
+
+    outcomes = asyncio.run(main())
+    assert len(calls) == 1
+    assert [result for result, _ in outcomes] == ["answer"] * 5
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_follower_takes_over_when_async_leader_is_cancelled():
+    flight, calls = SingleFlight(), []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05 if len(calls) > 1 else 5)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: calls)
+        follower = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: flight.stats()["coalesced"] == 1)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ("answer", False)
+    assert len(calls) == 2
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_follower_leaves_the_leader_running():
+    flight, calls = SingleFlight(), []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: calls)
+        follower = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: flight.stats()["coalesced"] == 1)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == ("answer", False)
+    assert len(calls) == 1
+
+
+def test_sync_caller_joins_async_leader():
+    flight, calls, release = SingleFlight(), [], threading.Event()
+
+    async def compute():
+        calls.append(1)
+        await asyncio.to_thread(release.wait, 5)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: calls)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            follower = pool.submit(flight.do, "key", lambda: calls.append(1) or "sync answer")
+            await async_wait_until(lambda: flight.stats()["coalesced"] == 1)
+            release.set()
+            return await leader, follower.result(5)
+
+    assert asyncio.run(main()) == (("answer", False), ("answer", True))
+    assert len(calls) == 1
+
+
+def test_async_caller_joins_sync_leader():
+    flight, calls, release = SingleFlight(), [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    async def follow():
+        return await flight.ado("key", lambda: asyncio.sleep(0, "async answer"))
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "key", compute)
+        wait_until(lambda: calls)
+        threading.Timer(0.05, release.set).start()
+        assert asyncio.run(follow()) == ("answer", True)
+        assert leader.result(5) == ("answer", False)
+    assert len(calls) == 1
+
+
+def test_sync_follower_takes_over_when_async_leader_is_cancelled():
+    flight, calls = SingleFlight(), []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(5)
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", compute))
+        await async_wait_until(lambda: calls)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            follower = pool.submit(flight.do, "key", lambda: calls.append(1) or "sync answer")
+            await async_wait_until(lambda: flight.stats()["coalesced"] == 1)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return follower.result(5)
+
+    assert asyncio.run(main()) == ("sync answer", False)
+    assert len(calls) == 2
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 1}